@@ -22,6 +22,6 @@ users_data = pd.read_csv(users_path)
 
 city = SimulationEngine(config, stations_data, users_data)
 
-start = time.time()
 city.run(until=1300000)
-print(time.time() - start)
+city.finish()
+print("construction:", round(city.construction_time, 3), "run:", round(city.run_time, 3))
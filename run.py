@@ -8,6 +8,7 @@ import os
 from src.SimulationEngine import SimulationEngine
 from preprocessing.BikeGeneration import BikeGeneration
 from src.Graph import Graph
+from src.SweepRunner import SweepRunner
 
 # %% LOAD GRAPH
 
@@ -17,6 +18,7 @@ name = "greater_boston_walk"
 # graph.save()
 
 graph = Graph.load(name)
+graph.set_path_cache(size=1000000, policy="lru", persist=True)
 
 MODE = 2
 # %% PARAMETERS MODE 0
@@ -231,21 +233,9 @@ if MODE == 5:
 
 # %% RUN MULTIPLE SIMULATIONS
 
-k = 0
-for config in grid:
-    k += 1
-    users_path = os.path.join("data", "user_trips_"+ str(config["USER_TRIPS_FILE"]) +".csv")
-
-    stations_path = os.path.join("data", "bluebikes_stations_07_2020.csv")
-    stations_data = BikeGeneration(config["NUM_BIKES"], config["MODE"], stations_path)
-    users_data = pd.read_csv(users_path) #, nrows=2000)
-
-    start = time.time()
-    city = SimulationEngine(config, stations_data, users_data, graph)
-    city.run(until=750000)
-    # city.run(until=650)
-    print("[", k, "/", len(grid) ,"]", round(time.time() - start, 3))
-    #break
+# all the cores, graph shared with the workers; finished configs are skipped when re-run
+runner = SweepRunner(graph, until=750000)
+runner.run(grid)
 
 # %% RUN ONE SIMULATION (EXAMPLE)
 
@@ -266,4 +256,5 @@ if False:
     start = time.time()
     city = SimulationEngine(config, stations_data, users_data, graph)
     city.run(until=650000)
+    city.finish()
     print(i, time.time() - start)
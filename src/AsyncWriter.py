@@ -0,0 +1,48 @@
+import queue
+import threading
+import logging.handlers
+
+
+class AsyncWriter:
+    # runs write jobs on a dedicated i/o thread, in submission order
+    # submit() blocks while max_pending jobs are waiting (backpressure on the simulation)
+    def __init__(self, max_pending=8):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.thread = threading.Thread(target=self.loop, name="results-writer", daemon=True)
+        self.thread.start()
+
+    def loop(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            function, args = job
+            if self.error is None:  # after a failure the remaining jobs are dropped, close() raises it
+                try:
+                    function(*args)
+                except BaseException as e:
+                    self.error = e
+
+    def submit(self, function, *args):
+        if self.error is not None:
+            raise self.error
+        self.queue.put((function, args))
+
+    def close(self):
+        # waits until every submitted job is written
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+class BlockingQueueHandler(logging.handlers.QueueHandler):
+    # waits for room in a bounded queue instead of dropping the record
+    def enqueue(self, record):
+        self.queue.put(record)
+
+
+class BlockingQueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
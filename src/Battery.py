@@ -1,13 +1,23 @@
 import logging
 
+from .FleetStore import FleetStore
+
 
 class Battery:
     id_count = -1
 
-    def __init__(self, capacity, charge_rate, discharge_rate, level=None):
+    def __init__(self, capacity, charge_rate, discharge_rate, level=None, fleet=None, bike_id=None):
         self.next_id()
         self.id = Battery.id_count
 
+        # the level lives in the fleet store, in the slot of the bike carrying the battery
+        if fleet is None:
+            fleet = FleetStore()
+            bike_id = 0
+            fleet.register(bike_id)
+        self.fleet = fleet
+        self.bike_id = bike_id
+
         self.capacity = capacity  # total energy
         self.charge_rate = charge_rate  # energy per time
         self.discharge_rate = discharge_rate  # energy per distance
@@ -15,6 +25,14 @@ class Battery:
             level = capacity
         self.level = level
 
+    @property
+    def level(self):
+        return float(self.fleet.battery[self.bike_id])
+
+    @level.setter
+    def level(self, level):
+        self.fleet.battery[self.bike_id] = level
+
     @classmethod
     def reset(cls):
         Battery.id_count = -1
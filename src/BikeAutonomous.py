@@ -1,16 +1,19 @@
-import logging
-
 from .Battery import Battery
 from .BikeTrip import BikeTrip
+from . import Trace
 import numpy as np
 
 class BikeAutonomous:
     id_count = -1
 
-    def __init__(self, env, graph, config, ui, results):
+    def __init__(self, env, graph, config, ui, results, fleet):
         self.next_id()
         self.id = BikeAutonomous.id_count
 
+        # state shared with the rest of the fleet (see FleetStore)
+        self.fleet = fleet
+        self.fleet.register(self.id)
+
         self.env = env
         self.graph = graph
         self.config = config
@@ -35,7 +38,7 @@ class BikeAutonomous:
         self.BATTERY_CHARGE_RATE = self.BATTERY_CAPACITY / (config["BATTERY_CHARGE_TIME"] * 3600)  # %/second  (This is 5h for 100% charge)
         self.BATTERY_LEVEL = np.random.randint(self.BATTERY_MIN_LEVEL, self.BATTERY_CAPACITY)
 
-        self.battery = Battery(self.BATTERY_CAPACITY, self.BATTERY_CHARGE_RATE, self.BATTERY_DISCHARGE_RATE, self.BATTERY_LEVEL)
+        self.battery = Battery(self.BATTERY_CAPACITY, self.BATTERY_CHARGE_RATE, self.BATTERY_DISCHARGE_RATE, self.BATTERY_LEVEL, self.fleet, self.id)
 
         self.station_id = None
         self.grid_id = None
@@ -49,6 +52,42 @@ class BikeAutonomous:
         self.ride_time = None
         self.charge_time = None
 
+    @property
+    def location(self):
+        return self._location
+
+    @location.setter
+    def location(self, location):
+        self._location = location
+        if location is not None:
+            self.fleet.set_location(self.id, location)
+
+    @property
+    def busy(self):
+        return bool(self.fleet.busy[self.id])
+
+    @busy.setter
+    def busy(self, busy):
+        self.fleet.busy[self.id] = busy
+
+    @property
+    def user_id(self):
+        user_id = self.fleet.user_id[self.id]
+        return None if user_id < 0 else int(user_id)
+
+    @user_id.setter
+    def user_id(self, user_id):
+        self.fleet.user_id[self.id] = -1 if user_id is None else user_id
+
+    @property
+    def station_id(self):
+        station_id = self.fleet.station_id[self.id]
+        return None if station_id < 0 else int(station_id)
+
+    @station_id.setter
+    def station_id(self, station_id):
+        self.fleet.station_id[self.id] = -1 if station_id is None else station_id
+
     @classmethod
     def reset(cls):
         BikeAutonomous.id_count = -1
@@ -57,12 +96,15 @@ class BikeAutonomous:
     def next_id(self):
         BikeAutonomous.id_count += 1
 
-    def set_location(self, location):
+    def set_location(self, location, snap=True):
+        # snap=False when the node of the location is already known
         self.location = location
-        self.update_node()
+        if snap:
+            self.update_node()
 
     def update_node(self):
         self.location.node = self.graph.closest_node_kdtree(self.location)
+        self.fleet.node[self.id] = self.location.node
         # self.location.node = self.graph.network.get_node_ids([self.location.lon], [self.location.lat])[0]
 
     def update_user(self, user_id):
@@ -100,7 +142,7 @@ class BikeAutonomous:
         self.battery.charge(time)
         self.location = destination
 
-    def autonomous_drive(self, destination, user_id=-1, magic=False, rebalancing=False, liberate=False, charge=False):
+    def autonomous_drive(self, destination, user_id=-1, instant=False, rebalancing=False, liberate=False, charge=False):
         
         self.busy = True
         # Data before
@@ -108,19 +150,20 @@ class BikeAutonomous:
         self.location_origin = self.location
         self.departure_time = self.env.now
 
-        logging.info(
-            "[%.2f] Bike %d driving autonomously from [%.4f, %.4f] to location [%.4f, %.4f]" % (self.env.now, self.id, self.location.lon, self.location.lat, destination.lon, destination.lat,)
-        )
+        if Trace.BIKE:
+            Trace.emit("bike_drive_start", self.env.now, self.id, self.location.lon, self.location.lat, destination.lon, destination.lat)
         distance = self.dist(self.location, destination)
-        if magic:
+        if instant:
             time = 0
         else:
             time = distance / self.AUTONOMOUS_SPEED
         yield self.env.timeout(time)
-        logging.info("[%.2f] Bike %d drove autonomously from [%.4f, %.4f] to location [%.4f, %.4f]" % (self.env.now, self.id, self.location.lon, self.location.lat, destination.lon, destination.lat,))
+        if Trace.BIKE:
+            Trace.emit("bike_drive_end", self.env.now, self.id, self.location.lon, self.location.lat, destination.lon, destination.lat)
         self.location = destination
         self.battery.discharge(distance)
-        logging.info("[%.2f] Battery level of bike %d: %.2f" % (self.env.now, self.id, self.battery.level))
+        if Trace.BIKE >= Trace.DEBUG:
+            Trace.emit("bike_battery", self.env.now, self.id, self.battery.level)
 
         # Data after
         self.ride_time = self.env.now - self.departure_time
@@ -138,7 +181,8 @@ class BikeAutonomous:
                 yield self.env.process(self.autonomous_charge())
 
     def autonomous_charge(self):
-        logging.info("[%.2f] Bike %d needs to recharge. Battery level:  %.2f" % (self.env.now, self.id, self.battery.level))
+        if Trace.BIKE:
+            Trace.emit("bike_needs_charge", self.env.now, self.id, self.battery.level)
         self.departure_time = self.env.now
         self.location_origin = self.location
 
@@ -153,7 +197,8 @@ class BikeAutonomous:
             if self.station_id is None:
                 continue  # Will try again
 
-            logging.info("[%.2f] Bike %d going to station %d for recharge" % (self.env.now, self.id, self.station_id))
+            if Trace.BIKE:
+                Trace.emit("bike_to_charge", self.env.now, self.id, self.station_id)
 
             # 3-Drive autonomously to station
             yield self.env.process(self.autonomous_drive(station_location))
@@ -172,7 +217,8 @@ class BikeAutonomous:
 
         # 7-Set bike as free for use again
         self.busy = False
-        logging.info("[%.2f] Bike %d is charged and available again" % (self.env.now, self.id))
+        if Trace.BIKE:
+            Trace.emit("bike_charged", self.env.now, self.id)
 
         # 8-Save trip
         self.destination_station = self.station_id
@@ -186,22 +232,27 @@ class BikeAutonomous:
         if action == "lock":
             if self.ui.station_has_docks(self.station_id):
                 self.ui.station_attach_bike(self.station_id, self.id)
-                logging.info("[%.2f] Bike %d locked in charging station %d" % (self.env.now, self.id, self.station_id))
+                if Trace.BIKE:
+                    Trace.emit("bike_lock_charging", self.env.now, self.id, self.station_id)
                 self.event_interact_station.succeed()
             else:
-                logging.info("[%.2f] Bike %d,station %d had zero docks available at arrival" % (self.env.now, self.id, self.station_id))
+                if Trace.BIKE:
+                    Trace.emit("bike_no_docks_charging", self.env.now, self.id, self.station_id)
         elif action == "unlock":
             self.ui.station_detach_bike(self.station_id, self.id)
-            logging.info("[%.2f] Bike %d unlocked from charging station %d" % (self.env.now, self.id, self.station_id))
+            if Trace.BIKE:
+                Trace.emit("bike_unlock_charging", self.env.now, self.id, self.station_id)
 
         yield self.env.timeout(1)  # TODO: remove??
 
     def battery_charge(self):
-        logging.info("[%.2f] Bike %d started recharging" % (self.env.now, self.id))
+        if Trace.BIKE:
+            Trace.emit("bike_charge_start", self.env.now, self.id)
         time = self.battery.total_charge_time()
         yield self.env.timeout(time)
         self.battery.charge(time)
-        logging.info("[%.2f] Bike %d fully charged" % (self.env.now, self.id))
+        if Trace.BIKE:
+            Trace.emit("bike_charge_end", self.env.now, self.id)
 
     def save_bike_drive_trip(self, user_id):
         self.bike_drive_trip.set("bike_id", self.id)
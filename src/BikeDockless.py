@@ -1,10 +1,14 @@
 class BikeDockless:
     id_count = -1
 
-    def __init__(self, env, graph, config):
+    def __init__(self, env, graph, config, fleet):
         self.next_id()
         self.id = BikeDockless.id_count
 
+        # state shared with the rest of the fleet (see FleetStore)
+        self.fleet = fleet
+        self.fleet.register(self.id)
+
         self.env = env
         self.graph = graph
         self.config = config
@@ -15,6 +19,33 @@ class BikeDockless:
 
         self.RIDING_SPEED = config["RIDING_SPEED"] / 3.6  # m/s
 
+    @property
+    def location(self):
+        return self._location
+
+    @location.setter
+    def location(self, location):
+        self._location = location
+        if location is not None:
+            self.fleet.set_location(self.id, location)
+
+    @property
+    def busy(self):
+        return bool(self.fleet.busy[self.id])
+
+    @busy.setter
+    def busy(self, busy):
+        self.fleet.busy[self.id] = busy
+
+    @property
+    def user(self):
+        user_id = self.fleet.user_id[self.id]
+        return None if user_id < 0 else int(user_id)
+
+    @user.setter
+    def user(self, user_id):
+        self.fleet.user_id[self.id] = -1 if user_id is None else user_id
+
     @classmethod
     def reset(cls):
         BikeDockless.id_count = -1
@@ -22,12 +53,15 @@ class BikeDockless:
     def next_id(self):
         BikeDockless.id_count += 1
 
-    def set_location(self, location):
+    def set_location(self, location, snap=True):
+        # snap=False when the node of the location is already known
         self.location = location
-        self.update_node()
+        if snap:
+            self.update_node()
 
     def update_node(self):
         self.location.node = self.graph.closest_node_kdtree(self.location)
+        self.fleet.node[self.id] = self.location.node
         # self.location.node = self.graph.network.get_node_ids([self.location.lon], [self.location.lat])[0]
 
     def update_user(self, user_id):
@@ -0,0 +1,100 @@
+import math
+
+import numpy as np
+
+
+class BikeLocator:
+    # uniform grid hash (in degrees) over bike positions, updated in place when bikes move
+    # availability is not stored in the grid, it is checked on the candidates of every query
+    def __init__(self, locations, cell_size=0.005):
+        self.cell_size = cell_size
+        self.locations = np.array(locations, dtype=np.float64)[:, :2]  # [lon, lat] per bike id
+        self.cells = {}
+        self.bike_cell = [None] * len(self.locations)
+        self.bounds = None  # [i_min, i_max, j_min, j_max] of the cells ever used
+
+        for bike_id, (lon, lat) in enumerate(self.locations.tolist()):
+            self.insert(bike_id, lon, lat)
+
+    def cell(self, lon, lat):
+        return (math.floor(lon / self.cell_size), math.floor(lat / self.cell_size))
+
+    def insert(self, bike_id, lon, lat):
+        cell = self.cell(lon, lat)
+        self.cells.setdefault(cell, set()).add(bike_id)
+        self.bike_cell[bike_id] = cell
+        self.locations[bike_id] = (lon, lat)
+
+        i, j = cell
+        if self.bounds is None:
+            self.bounds = [i, i, j, j]
+        else:
+            self.bounds = [min(self.bounds[0], i), max(self.bounds[1], i), min(self.bounds[2], j), max(self.bounds[3], j)]
+
+    def remove(self, bike_id):
+        cell = self.bike_cell[bike_id]
+        self.cells[cell].discard(bike_id)
+        if not self.cells[cell]:
+            del self.cells[cell]
+        self.bike_cell[bike_id] = None
+
+    def move(self, bike_id, lon, lat):
+        if self.cell(lon, lat) == self.bike_cell[bike_id]:
+            self.locations[bike_id] = (lon, lat)
+            return
+        self.remove(bike_id)
+        self.insert(bike_id, lon, lat)
+
+    @staticmethod
+    def ring(ci, cj, r):
+        # cells at chebyshev distance r from (ci, cj)
+        if r == 0:
+            yield (ci, cj)
+            return
+        for i in range(ci - r, ci + r + 1):
+            yield (i, cj - r)
+            yield (i, cj + r)
+        for j in range(cj - r + 1, cj + r):
+            yield (ci - r, j)
+            yield (ci + r, j)
+
+    @staticmethod
+    def degrees(radius, lat):
+        # upper bound of the lon/lat euclidean distance of a point within radius meters
+        if not np.isfinite(radius):
+            return np.inf
+        return 1.05 * radius / (6378137.0 * np.pi / 180 * np.cos(np.radians(lat)))
+
+    def nearest(self, lon, lat, k, available, max_dist=np.inf):
+        # k nearest bikes in lon/lat euclidean distance (as the former kd-tree did) that pass available(bike_id)
+        # bikes at the same distance come in bike id order, the kd-tree returned them in its own order (see test_golden)
+        ci, cj = self.cell(lon, lat)
+        if self.bounds is None:
+            return np.array([], dtype=int), np.array([])
+        last = max(ci - self.bounds[0], self.bounds[1] - ci, cj - self.bounds[2], self.bounds[3] - cj)
+
+        found = []
+        r = 0
+        while r <= last:
+            for cell in BikeLocator.ring(ci, cj, r):
+                for bike_id in self.cells.get(cell, ()):
+                    if available(bike_id):
+                        blon, blat = self.locations[bike_id]
+                        found.append((math.hypot(blon - lon, blat - lat), bike_id))
+
+            # bikes in further rings are at least r * cell_size away
+            bound = r * self.cell_size
+            if len(found) >= k:
+                found.sort()
+                found = found[:k]
+                if found[-1][0] <= bound:
+                    break
+            if bound > max_dist:
+                break
+            r += 1
+
+        found.sort()
+        found = [(d, bike_id) for d, bike_id in found[:k] if d <= max_dist]
+        bikes_id = np.array([bike_id for _, bike_id in found], dtype=int)
+        distances = np.array([d for d, _ in found])
+        return bikes_id, distances
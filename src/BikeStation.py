@@ -1,10 +1,14 @@
 class BikeStation:
     id_count = -1
 
-    def __init__(self, env, graph, config):
+    def __init__(self, env, graph, config, fleet):
         self.next_id()
         self.id = BikeStation.id_count
 
+        # state shared with the rest of the fleet (see FleetStore)
+        self.fleet = fleet
+        self.fleet.register(self.id)
+
         self.env = env
         self.graph = graph
         self.config = config
@@ -16,6 +20,42 @@ class BikeStation:
 
         self.RIDING_SPEED = config["RIDING_SPEED"] / 3.6  # m/s
 
+    @property
+    def location(self):
+        return self._location
+
+    @location.setter
+    def location(self, location):
+        self._location = location
+        if location is not None:
+            self.fleet.set_location(self.id, location)
+
+    @property
+    def busy(self):
+        return bool(self.fleet.busy[self.id])
+
+    @busy.setter
+    def busy(self, busy):
+        self.fleet.busy[self.id] = busy
+
+    @property
+    def user(self):
+        user_id = self.fleet.user_id[self.id]
+        return None if user_id < 0 else int(user_id)
+
+    @user.setter
+    def user(self, user_id):
+        self.fleet.user_id[self.id] = -1 if user_id is None else user_id
+
+    @property
+    def station_id(self):
+        station_id = self.fleet.station_id[self.id]
+        return None if station_id < 0 else int(station_id)
+
+    @station_id.setter
+    def station_id(self, station_id):
+        self.fleet.station_id[self.id] = -1 if station_id is None else station_id
+
     @classmethod
     def reset(cls):
         BikeStation.id_count = -1
@@ -36,8 +76,9 @@ class BikeStation:
         if self.user is None:
             return True
 
-    def ride(self, destination):
-        distance = self.dist(self.location, destination)
+    def ride(self, destination, distance=None):
+        if distance is None:
+            distance = self.dist(self.location, destination)
         time = distance / self.RIDING_SPEED
         yield self.env.timeout(time)
         self.location = destination
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class BikeTrip:
     id_count = -1
     header = [
@@ -20,6 +23,9 @@ class BikeTrip:
         "battery_in",
         "battery_out",
     ]
+    # column types of the typed (parquet) results
+    dtypes = dict.fromkeys(header, "int64")
+    dtypes.update(dict.fromkeys(["origin_lon", "origin_lat", "destination_lon", "destination_lat"], "float64"))
 
     def __init__(self):
         self.next_id()
@@ -44,17 +50,16 @@ class BikeTrip:
 
     def set(self, key, value, digits=2):
         if key in self.store.keys():
+            # typed values, formatted (if at all) when the results are written
+            if isinstance(value, np.generic):
+                value = value.item()  # numpy scalars print and sum like python ones only after this
             if isinstance(value, bool):
                 value = int(value)
-                value = str(value)
-            elif isinstance(value, int):
-                value = str(value)
             elif isinstance(value, float):
                 if digits == 0:
                     value = int(value)
                 else:
                     value = round(value, digits)
-                value = str(value)
             self.store[key] = value
         else:
             raise BaseException
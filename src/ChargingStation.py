@@ -1,9 +1,10 @@
 import simpy
 import random
-import logging
 import numpy as np
 import pandas as pd
 
+from . import Trace
+
 # import matplotlib.pyplot as plt
 # from Router import Network
 # import time
@@ -33,7 +34,8 @@ class ChargingStation:
             self.n_bikes += 1
             self.bikes.append(bike_id)
         else:
-            logging.info("[%.2f] Charging station %d has no spaces available" % (self.env.now, self.station_id))
+            if Trace.STATION:
+                Trace.emit("charging_station_full", self.env.now, self.station_id)
 
     def detach_bike(self, bike_id):
         self.n_bikes -= 1
@@ -0,0 +1,29 @@
+import simpy
+
+from . import Profiler
+
+
+class CountingEnvironment(simpy.Environment):
+    # simpy environment that counts the processed events (reported in the run manifest)
+    # and the scheduled ones, so the pending events are known without reading the simpy heap
+    def __init__(self, initial_time=0):
+        super().__init__(initial_time)
+        self.events_processed = 0
+        self.events_scheduled = 0
+
+    @property
+    def events_pending(self):
+        return self.events_scheduled - self.events_processed
+
+    def schedule(self, event, priority=simpy.core.NORMAL, delay=0):
+        self.events_scheduled += 1
+        super().schedule(event, priority, delay)
+
+    @Profiler.phase("event_dispatch")
+    def step(self):
+        self.events_processed += 1
+        try:
+            super().step()
+        except simpy.core.EmptySchedule:
+            self.events_processed -= 1  # nothing was processed
+            raise
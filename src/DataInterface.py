@@ -1,6 +1,8 @@
 import numpy as np
-from scipy import spatial
-import logging
+
+from .BikeLocator import BikeLocator
+from . import Trace
+from . import Profiler
 
 
 class DataInterface:
@@ -11,6 +13,10 @@ class DataInterface:
 
         self.stations = []
         self.bikes = []
+        self.fleet = None
+        self.stations_distances = None  # station x station road distances of this simulation, see set_stations_distances
+        self.bikes_active = 0  # autonomous drives and charges under way, for users or for rebalancing
+        self.bike_callbacks = []  # called every time one of them ends
 
         self.MODE = config["MODE"]
         self.WALK_RADIUS = config["WALK_RADIUS"]
@@ -20,10 +26,11 @@ class DataInterface:
         self.INSTANT_MIN_BIKES = config["INSTANT_MIN_BIKES"]
         self.INSTANT_MIN_DOCKS = config["INSTANT_MIN_DOCKS"]
 
-    def set_bikes(self, bikes):
+    def set_bikes(self, bikes, fleet):
         self.bikes = bikes
+        self.fleet = fleet
         if self.MODE == 1 or self.MODE == 2:
-            self.bikes_location = np.array([[bike.location.lon, bike.location.lat, bike.location.node] for bike in self.bikes])
+            self.bike_locator = BikeLocator(self.fleet.locations())
 
     def set_stations(self, stations):
         self.stations = stations
@@ -32,9 +39,20 @@ class DataInterface:
         self.stations = stations
         self.bikes = bikes
 
+    def set_stations_distances(self, nodes, distances):
+        self.stations_distances = distances
+        # row of the matrix for every graph node, -1 if there is no station on it
+        self.stations_rows = np.full(len(self.graph.nodes), -1, dtype=np.int32)
+        self.stations_rows[nodes] = np.arange(len(nodes), dtype=np.int32)
+
     def dist(self, a, b):
+        if self.stations_distances is not None:
+            i, j = self.stations_rows[a.node], self.stations_rows[b.node]
+            if i >= 0 and j >= 0:
+                return float(self.stations_distances[i, j])
         return self.graph.shortest_path_length(a, b)
 
+    @Profiler.phase("station_lookup")
     def select_start_station(self, location, visited_stations):
         (stations_id, road_distances, air_distances,) = self.graph.shortest_path_length_stations(location)
 
@@ -54,6 +72,7 @@ class DataInterface:
 
         return None, None, visited_stations, any_walkable
 
+    @Profiler.phase("station_lookup")
     def select_end_station(self, destination, visited_stations):
         (stations_id, road_distances, air_distances,) = self.graph.shortest_path_length_stations(destination)
 
@@ -65,9 +84,11 @@ class DataInterface:
                 visited_stations.append(sid)
                 return sid, station.location, visited_stations
 
-        logging.info("[%.2f] No docks in a walkable distance" % (self.env.now))
+        if Trace.INTERFACE:
+            Trace.emit("no_walkable_docks", self.env.now)
         return None, None, visited_stations
 
+    @Profiler.phase("station_lookup")
     def instant_bike(self, location, visited_stations):
         (stations_id, road_distances, air_distances,) = self.graph.shortest_path_length_stations(location)
 
@@ -80,7 +101,8 @@ class DataInterface:
                 break
 
         if source_station_id is None:
-            logging.info("[%.2f] No stations found as source of instant bike" % (self.env.now))
+            if Trace.INTERFACE:
+                Trace.emit("no_instant_bike_source", self.env.now)
             return None, None, visited_stations, None, None
 
         for sid, dist in zip(stations_id, air_distances):
@@ -101,9 +123,11 @@ class DataInterface:
                     source_station_id,
                 )
 
-        logging.info("[%.2f] No stations found as target for instant bike" % (self.env.now))
+        if Trace.INTERFACE:
+            Trace.emit("no_instant_bike_target", self.env.now)
         return None, None, visited_stations, None, None
 
+    @Profiler.phase("station_lookup")
     def instant_dock(self, location, visited_stations):
         (stations_id, road_distances, air_distances,) = self.graph.shortest_path_length_stations(location)
 
@@ -116,7 +140,8 @@ class DataInterface:
                 break
 
         if source_station_id is None:
-            logging.info("[%.2f] No stations found as target of instant bike" % (self.env.now))
+            if Trace.INTERFACE:
+                Trace.emit("no_instant_dock_target", self.env.now)
             return None, None, visited_stations, None, None
 
         for sid, dist in zip(stations_id, air_distances):
@@ -137,9 +162,11 @@ class DataInterface:
                     source_station_id,
                 )
 
-        logging.info("[%.2f] No stations found as source for instant bike" % (self.env.now))
+        if Trace.INTERFACE:
+            Trace.emit("no_instant_dock_source", self.env.now)
         return None, None, visited_stations, None, None
 
+    @Profiler.phase("station_lookup")
     def notwalkable_dock(self, destination, visited_stations):
 
         (stations_id, road_distances, air_distances,) = self.graph.shortest_path_length_stations(destination)
@@ -151,20 +178,10 @@ class DataInterface:
                 visited_stations.append(sid)
                 return sid, station.location, visited_stations
 
-        logging.info("[%.2f] ERROR: No station with docks -> Think about changing this part of the code" % (self.env.now))
+        if Trace.INTERFACE:
+            Trace.emit("no_station_docks", self.env.now)
         return None, None, visited_stations
 
-    @staticmethod
-    def cartesian(lon, lat):
-        lat = lat * (np.pi / 180)
-        lon = lon * (np.pi / 180)
-
-        R = 6378137.0
-        X = R * np.cos(lat) * np.cos(lon)
-        Y = R * np.cos(lat) * np.sin(lon)
-        Z = R * np.sin(lat)
-        return np.array([X, Y, Z]).T
-
     @staticmethod
     def haversine_np(lon1, lat1, lon2, lat2):
         lon1 = np.radians(lon1)
@@ -186,67 +203,58 @@ class DataInterface:
         x, y = [list(tuple) for tuple in tuples]
         return x, y
 
-    def select_dockless_bike(self, location):
-        # nearest, not busy and walkable
+    def bike_available(self, bike_id):
+        return not self.fleet.busy[bike_id]
+
+    def bike_available_charged(self, bike_id):
+        return not self.fleet.busy[bike_id] and self.fleet.battery[bike_id] > self.BATTERY_MIN_LEVEL
 
-        # filter by not busy
-        available_bikes = [bike for bike in self.bikes if not bike.busy]
-        available_bikes_id = [bike.id for bike in available_bikes]
-        locations = self.bikes_location[available_bikes_id]
+    def nearest_available_bikes(self, location, available, radius=np.inf, k=10):
+        # k nearest available bikes (via-air), looked up in the bike locator
         user_location = location.get_loc()
+        max_dist = BikeLocator.degrees(radius, user_location[1])
+        bikes_id, _ = self.bike_locator.nearest(user_location[0], user_location[1], k, available, max_dist)
+        air_distances = DataInterface.haversine_np(user_location[0], user_location[1], self.fleet.lon[bikes_id], self.fleet.lat[bikes_id],)
+        return bikes_id, air_distances
 
-        # create kd-tree and find k nearest
-        k = min(10, len(available_bikes_id))
-        option = "degrees"  # "degrees", "cartesian", "balltree"
-        if option == "degrees":
-            kdtree = spatial.cKDTree(locations[:, :2], leafsize=50, compact_nodes=False, balanced_tree=False)
-            _, bikes_id = kdtree.query(user_location, k)
-            air_distances = DataInterface.haversine_np(user_location[0], user_location[1], locations[bikes_id, 0], locations[bikes_id, 1],)
-
-        if option == "cartesian":
-            locations_cartesian = DataInterface.cartesian(locations[:, 0], locations[:, 1])
-            location_cartesian = DataInterface.cartesian(user_location[0], user_location[1])
-            kdtree = spatial.cKDTree(locations_cartesian, leafsize=50, compact_nodes=False, balanced_tree=False,)
-            air_distances, bikes_id = kdtree.query(location_cartesian, k)
-
-        if option == "balltree":
-            # alternative: use sklearn and haversine distance
-            from sklearn.neighbors import BallTree
-
-            R = 6371000
-            bt = BallTree(np.deg2rad(locations[:, [1, 0]]), metric="haversine")
-            loc = np.deg2rad(user_location)[::-1]
-            air_distances, bikes_id = bt.query([loc], k)
-            air_distances = air_distances[0]
-            bikes_id = bikes_id[0]
-            air_distances = air_distances * R
+    def update_bike_location(self, bike_id):
+        # the fleet store is already up to date, only the locator has to follow
+        self.bike_locator.move(bike_id, self.fleet.lon[bike_id], self.fleet.lat[bike_id])
+
+    @Profiler.phase("bike_lookup")
+    def select_dockless_bike(self, location):
+        # nearest, not busy and walkable
+        bikes_id, air_distances = self.nearest_available_bikes(location, self.bike_available, self.WALK_RADIUS)
 
         # TODO: DONE check if nearest bike via-air is walkable => if not return None
-        if air_distances[0] > self.WALK_RADIUS:
-            logging.info("[%.2f] No bikes in walkable distance" % (self.env.now))
+        if len(bikes_id) < 1 or air_distances[0] > self.WALK_RADIUS:
+            if Trace.INTERFACE:
+                Trace.emit("no_walkable_bikes", self.env.now)
             return None, None
 
         # get nodes in graph and estimate shortest path lengths
         user_node = location.node
-        bikes_nodes = locations[bikes_id, 2].astype(int)
+        bikes_nodes = self.fleet.node[bikes_id]
 
         # TODO: if the walkable criteria is based on air-distances, do we need the road_distance?
         # only for sorting, because the bikes_id are selected based on kdtree (air-distances)
-        distances = self.graph.network.shortest_path_lengths(np.tile(user_node, k), bikes_nodes)
+        distances = self.graph.shortest_path_lengths(np.tile(user_node, len(bikes_id)), bikes_nodes)
         bikes_id, distances = DataInterface.sort_lists(bikes_id, distances, 1)
         air_distances, distances = DataInterface.sort_lists(air_distances, distances, 1)
 
         # look for walkable ones
         for bid, dist in zip(bikes_id, air_distances):
-            bike = available_bikes[bid]
+            bike = self.bikes[bid]
             walkable = dist < self.WALK_RADIUS
             if walkable:
                 return bike.id, bike.location
 
-        logging.info("[%.2f] No bikes in walkable distance" % (self.env.now))
+        if Trace.INTERFACE:
+            Trace.emit("no_walkable_bikes", self.env.now)
         return None, None
 
 
+    @Profiler.phase("station_lookup")
     def select_charging_station(self, location, visited_stations):
         (stations_id, road_distances, air_distances,) = self.graph.shortest_path_length_stations(location)
 
@@ -257,171 +265,104 @@ class DataInterface:
                 visited_stations.append(sid)
                 return sid, station.location, visited_stations
 
-        logging.info("[%.2f] No charging stations with available space" % (self.env.now))
+        if Trace.INTERFACE:
+            Trace.emit("no_charging_station", self.env.now)
         return None, None, visited_stations
 
+    @Profiler.phase("bike_lookup")
     def call_autonomous_bike(self, location):
         # not busy, reachable, with battery
-
-        # filter by not busy and with battery
-        available_bikes = [bike for bike in self.bikes if not bike.busy and bike.battery.level > self.BATTERY_MIN_LEVEL]
-        available_bikes_id = [bike.id for bike in available_bikes]
-        logging.info("[%.2f] available bikes: " % (self.env.now) + str(available_bikes_id))
-        locations = self.bikes_location[available_bikes_id]
-        user_location = location.get_loc()
-
-        if len(available_bikes_id) < 1:
-            logging.info("[%.2f] No available bikes" % (self.env.now))
-            return None, None
-
-        # create kd-tree and find k nearest
-        k = min(10, len(available_bikes_id))
-        option = "degrees"  # "degrees", "cartesian", "balltree"
-        if option == "degrees":
-            kdtree = spatial.cKDTree(locations[:, :2], leafsize=50, compact_nodes=False, balanced_tree=False)
-            _, bikes_id = kdtree.query(user_location, k)
-            air_distances = DataInterface.haversine_np(user_location[0], user_location[1], locations[bikes_id, 0], locations[bikes_id, 1],)
-
-        if option == "cartesian":
-            locations_cartesian = DataInterface.cartesian(locations[:, 0], locations[:, 1])
-            location_cartesian = DataInterface.cartesian(user_location[0], user_location[1])
-            kdtree = spatial.cKDTree(locations_cartesian, leafsize=50, compact_nodes=False, balanced_tree=False,)
-            air_distances, bikes_id = kdtree.query(location_cartesian, k)
-
-        if option == "balltree":
-            # alternative: use sklearn and haversine distance
-            from sklearn.neighbors import BallTree
-
-            R = 6371000
-            bt = BallTree(np.deg2rad(locations[:, [1, 0]]), metric="haversine")
-            loc = np.deg2rad(user_location)[::-1]
-            air_distances, bikes_id = bt.query([loc], k)
-            air_distances = air_distances[0]
-            bikes_id = bikes_id[0]
-            air_distances = air_distances * R
+        bikes_id, air_distances = self.nearest_available_bikes(location, self.bike_available_charged, self.AUTONOMOUS_RADIUS)
 
         # TODO: DONE check if nearest bike via-air is walkable => if not return None
-        air_distances = np.atleast_1d(air_distances)
-        bikes_id = np.atleast_1d(bikes_id)
-
-        if air_distances[0] > self.AUTONOMOUS_RADIUS:
-            logging.info("[%.2f] No bikes in walkable distance" % (self.env.now))
+        if len(bikes_id) < 1 or air_distances[0] > self.AUTONOMOUS_RADIUS:
+            if Trace.INTERFACE:
+                Trace.emit("no_walkable_bikes", self.env.now)
             return None, None
 
         # get nodes in graph and estimate shortest path lengths
         user_node = location.node
-        bikes_nodes = np.atleast_1d(locations[bikes_id, 2].astype(int))
+        bikes_nodes = self.fleet.node[bikes_id]
 
         # TODO: if the walkable criteria is based on air-distances, do we need the road_distance?
         # only for sorting, because the bikes_id are selected based on kdtree (air-distances)
-        distances = self.graph.network.shortest_path_lengths(np.tile(user_node, k), bikes_nodes)
+        distances = self.graph.shortest_path_lengths(np.tile(user_node, len(bikes_id)), bikes_nodes)
         if len(distances) > 1:
             bikes_id, distances = DataInterface.sort_lists(bikes_id, distances, 1)
             air_distances, distances = DataInterface.sort_lists(air_distances, distances, 1)
 
         # look for walkable ones
         for bid, dist in zip(bikes_id, air_distances):
-            bike = available_bikes[bid]
+            bike = self.bikes[bid]
             reachable = dist < self.AUTONOMOUS_RADIUS
             busy = bike.busy
             if reachable and not busy:
                 bike.busy = True
                 return bike.id, bike.location
 
-        logging.info("[%.2f] No bikes in reachable distance" % (self.env.now))
+        if Trace.INTERFACE:
+            Trace.emit("no_reachable_bikes", self.env.now)
         return None, None
 
+    @Profiler.phase("bike_lookup")
     def call_autonomous_instant_bike(self, location):
-        # not busy, reachable, with battery
-
-        # filter by not busy and with battery
-        available_bikes = [bike for bike in self.bikes if not bike.busy and bike.battery.level > self.BATTERY_MIN_LEVEL]
-        available_bikes_id = [bike.id for bike in available_bikes]
-        logging.info("[%.2f] available bikes: " % (self.env.now) + str(available_bikes_id))
-        locations = self.bikes_location[available_bikes_id]
-        user_location = location.get_loc()
+        # not busy, with battery (no distance limit)
+        bikes_id, air_distances = self.nearest_available_bikes(location, self.bike_available_charged)
 
-        if len(available_bikes_id) < 1:
-            logging.info("[%.2f] No available bikes" % (self.env.now))
+        if len(bikes_id) < 1:
+            if Trace.INTERFACE:
+                Trace.emit("no_available_bikes", self.env.now)
             return None, None
 
-        # create kd-tree and find k nearest
-        k = min(10, len(available_bikes_id))
-        option = "degrees"  # "degrees", "cartesian", "balltree"
-        if option == "degrees":
-            kdtree = spatial.cKDTree(locations[:, :2], leafsize=50, compact_nodes=False, balanced_tree=False)
-            _, bikes_id = kdtree.query(user_location, k)
-            air_distances = DataInterface.haversine_np(user_location[0], user_location[1], locations[bikes_id, 0], locations[bikes_id, 1],)
-
-        if option == "cartesian":
-            locations_cartesian = DataInterface.cartesian(locations[:, 0], locations[:, 1])
-            location_cartesian = DataInterface.cartesian(user_location[0], user_location[1])
-            kdtree = spatial.cKDTree(locations_cartesian, leafsize=50, compact_nodes=False, balanced_tree=False,)
-            air_distances, bikes_id = kdtree.query(location_cartesian, k)
-
-        if option == "balltree":
-            # alternative: use sklearn and haversine distance
-            from sklearn.neighbors import BallTree
-
-            R = 6371000
-            bt = BallTree(np.deg2rad(locations[:, [1, 0]]), metric="haversine")
-            loc = np.deg2rad(user_location)[::-1]
-            air_distances, bikes_id = bt.query([loc], k)
-            air_distances = air_distances[0]
-            bikes_id = bikes_id[0]
-            air_distances = air_distances * R
-
-        # TODO: DONE check if nearest bike via-air is walkable => if not return None
-        air_distances = np.atleast_1d(air_distances)
-        bikes_id = np.atleast_1d(bikes_id)
-
-        # if air_distances[0] > self.AUTONOMOUS_RADIUS:
-        #     logging.info("[%.2f] No bikes in walkable distance" % (self.env.now))
-        #     return None, None
-
         # get nodes in graph and estimate shortest path lengths
         user_node = location.node
-        bikes_nodes = np.atleast_1d(locations[bikes_id, 2].astype(int))
+        bikes_nodes = self.fleet.node[bikes_id]
 
         # TODO: if the walkable criteria is based on air-distances, do we need the road_distance?
         # only for sorting, because the bikes_id are selected based on kdtree (air-distances)
-        distances = self.graph.network.shortest_path_lengths(np.tile(user_node, k), bikes_nodes)
+        distances = self.graph.shortest_path_lengths(np.tile(user_node, len(bikes_id)), bikes_nodes)
         if len(distances) > 1:
             bikes_id, distances = DataInterface.sort_lists(bikes_id, distances, 1)
             air_distances, distances = DataInterface.sort_lists(air_distances, distances, 1)
 
         # look for walkable ones
         for bid, dist in zip(bikes_id, air_distances):
-            bike = available_bikes[bid]
+            bike = self.bikes[bid]
             busy = bike.busy
             if not busy:
                 bike.busy = True
                 return bike.id, bike.location
 
-        logging.info("[%.2f] No bikes in reachable distance" % (self.env.now))
+        if Trace.INTERFACE:
+            Trace.emit("no_reachable_bikes", self.env.now)
         return None, None
 
-
     def bike_ride(self, bike_id, location):
         bike = self.bikes[bike_id]
-        yield self.env.process(bike.ride(location))
+        if self.MODE == 0:
+            # station to station, looked up in the stations matrix when there is one
+            yield self.env.process(bike.ride(location, self.dist(bike.location, location)))
+        else:
+            yield self.env.process(bike.ride(location))
 
         if self.MODE == 1 or self.MODE == 2:
-            self.bikes_location[bike_id] = [
-                bike.location.lon,
-                bike.location.lat,
-                bike.location.node,
-            ]
+            self.update_bike_location(bike_id)
 
     def autonomous_drive(self, bike_id, location, user_id, instant, rebalancing, liberate, charge):
+        self.bike_started()
         bike = self.bikes[bike_id]
         yield self.env.process(bike.autonomous_drive(location, user_id, instant, rebalancing, liberate, charge))
 
-        self.bikes_location[bike_id] = [
-            bike.location.lon,
-            bike.location.lat,
-            bike.location.node,
-        ]
+        self.update_bike_location(bike_id)
+        self.bike_finished()
+
+    def bike_started(self):
+        self.bikes_active += 1
+
+    def bike_finished(self):
+        self.bikes_active -= 1
+        for callback in self.bike_callbacks:
+            callback()
 
     def station_has_bikes(self, station_id):
         station = self.stations[station_id]
@@ -469,13 +410,11 @@ class DataInterface:
 
     def bike_charge(self, bike_id):
         bike = self.bikes[bike_id]
-        low_battery = bike.battery.level < self.BATTERY_MIN_LEVEL
-        busy = bike.busy
+        low_battery = self.fleet.battery[bike_id] < self.BATTERY_MIN_LEVEL
+        busy = self.fleet.busy[bike_id]
         if low_battery and not busy:
+            self.bike_started()
             yield self.env.process(bike.autonomous_charge())
 
-            self.bikes_location[bike_id] = [
-                bike.location.lon,
-                bike.location.lat,
-                bike.location.node,
-            ]
\ No newline at end of file
+            self.update_bike_location(bike_id)
+            self.bike_finished()
\ No newline at end of file
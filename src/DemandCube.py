@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+
+class DemandCube:
+    # cumulative demand per rebalancing cell over the time bins of the demand table (time bin x cell)
+    # the demand of any window is the difference of two rows, no slicing or groupby per rebalancing period
+    # built from the loaded table in milliseconds, so it is kept in memory (not cached or memory-mapped)
+    def __init__(self, demand, grid):
+        cells = pd.MultiIndex.from_arrays([grid.group_lon, grid.group_lat]).get_indexer(
+            pd.MultiIndex.from_arrays([demand.group_lon, demand.group_lat])
+        )  # cells in grid order, as the bikes are counted
+        self.times, bins = np.unique(demand.index.values, return_inverse=True)
+
+        counts = np.zeros((len(self.times) + 1, len(grid)), dtype=np.int64)
+        np.add.at(counts, (bins.ravel() + 1, cells), 1)
+        self.cumulative = np.cumsum(counts, axis=0)  # row k: demand before the k-th time bin
+
+    def window(self, start, stop):
+        # demand per cell with start <= time <= stop
+        first = np.searchsorted(self.times, start, side="left")
+        last = np.searchsorted(self.times, stop, side="right")
+        return self.cumulative[last] - self.cumulative[first]
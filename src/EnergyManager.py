@@ -1,4 +1,4 @@
-import logging
+from . import Trace
 
 
 class EnergyManager:
@@ -17,7 +17,8 @@ class EnergyManager:
 
     def battery_check(self):
         while True:
-            logging.info("[%.2f] Battery check" % (self.env.now))
+            if Trace.REBALANCING:
+                Trace.emit("battery_check", self.env.now)
             for bike in self.bikes:
                 low_battery = bike.battery.level < self.BATTERY_MIN_LEVEL
                 busy = bike.busy
@@ -0,0 +1,138 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from . import Trace
+
+# one fixed width record per trace event, missing ids are -1 and missing values nan
+RECORD = np.dtype(
+    [("time", "<f8"), ("event", "<u2"), ("agent", "<i4"), ("bike", "<i4"), ("station", "<i4"), ("lon", "<f8"), ("lat", "<f8"), ("value", "<f4")]
+)
+
+
+class EventLog:
+    # binary trace sink: buffers the event tuples and appends them to a .bin file as RECORD rows
+    # the event names of the ids are saved next to it (.json), so old logs decode with newer code
+    def __init__(self, file, buffer_size=65536, io=None):
+        self.file = file
+        self.buffer_size = buffer_size
+        self.io = io
+        self.rows = []
+
+        self.names = list(Trace.EVENTS)
+        with open(os.path.splitext(file)[0] + ".json", "w") as f:
+            json.dump({"events": self.names, "dtype": RECORD.descr}, f)
+        self.out = open(file, "wb")
+
+        # where the values of every event go in the record (the destination wins over the origin)
+        self.layout = {}
+        for event_id, (event, (_, _, _, fields)) in enumerate(Trace.EVENTS.items()):
+            slots = [fields.index(name) if name in fields else -1 for name in ["user", "bike", "station"]]
+            slots.append(fields.index("to_lon") if "to_lon" in fields else fields.index("lon") if "lon" in fields else -1)
+            slots.append(fields.index("to_lat") if "to_lat" in fields else fields.index("lat") if "lat" in fields else -1)
+            slots.append(fields.index("value") if "value" in fields else -1)
+            self.layout[event] = (event_id, slots)
+
+    def __call__(self, record):
+        event_id, slots = self.layout[record[0]]
+        values = record[2:]
+        agent, bike, station, lon, lat, value = [values[slot] if slot >= 0 else None for slot in slots]
+        self.rows.append(
+            (
+                record[1],
+                event_id,
+                -1 if agent is None else agent,
+                -1 if bike is None else bike,
+                -1 if station is None else station,
+                np.nan if lon is None else lon,
+                np.nan if lat is None else lat,
+                np.nan if value is None else value,
+            )
+        )
+        if len(self.rows) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        records = np.array(self.rows, dtype=RECORD)
+        self.rows = []
+        if self.io is None:
+            records.tofile(self.out)
+        else:
+            self.io.submit(records.tofile, self.out)
+
+    def close(self):
+        self.flush()
+        if self.io is None:
+            self.out.close()
+        else:
+            self.io.submit(self.out.close)
+
+    @staticmethod
+    def read(file):
+        # records and event names of a binary log
+        with open(os.path.splitext(file)[0] + ".json") as f:
+            meta = json.load(f)
+        return np.fromfile(file, dtype=RECORD), meta["events"]
+
+    @staticmethod
+    def decode(file):
+        # binary log as a data frame, with the event names
+        records, names = EventLog.read(file)
+        data = pd.DataFrame(records)
+        data["event"] = pd.Categorical.from_codes(data["event"], categories=names)
+        return data
+
+    @staticmethod
+    def replay(file, times):
+        # fleet state at every time of times (increasing), as seen from the events up to that time
+        # initial positions come from the bike_state events (BIKE trace level DEBUG)
+        records, names = EventLog.read(file)
+        events = np.array(names)[records["event"]]
+        n = max(int(records["bike"].max()) + 1, 0) if len(records) else 0
+        state = {
+            "lon": np.full(n, np.nan),
+            "lat": np.full(n, np.nan),
+            "station": np.full(n, -1, dtype=np.int64),
+            "user": np.full(n, -1, dtype=np.int64),
+            "driving": np.zeros(n, dtype=bool),
+            "battery": np.full(n, np.nan),
+        }
+        riding_to = {}  # bike -> destination of the ongoing user ride
+
+        k = 0
+        for time in times:
+            while k < len(records) and records["time"][k] <= time:
+                event, record = events[k], records[k]
+                bike = record["bike"]
+                if bike >= 0:
+                    if event == "bike_state":
+                        state["lon"][bike], state["lat"][bike] = record["lon"], record["lat"]
+                        state["station"][bike] = record["station"]
+                        state["battery"][bike] = record["value"]
+                    elif event in ("user_unlock", "user_unlock_station", "user_autonomous_bike"):
+                        state["user"][bike] = record["agent"]
+                        state["station"][bike] = -1
+                    elif event == "user_ride":
+                        riding_to[bike] = (record["lon"], record["lat"])
+                    elif event in ("user_lock", "user_lock_station"):
+                        state["user"][bike] = -1
+                        state["station"][bike] = record["station"]
+                        if bike in riding_to:
+                            state["lon"][bike], state["lat"][bike] = riding_to.pop(bike)
+                    elif event == "bike_drive_start":
+                        state["driving"][bike] = True
+                    elif event == "bike_drive_end":
+                        state["driving"][bike] = False
+                        state["lon"][bike], state["lat"][bike] = record["lon"], record["lat"]
+                    elif event in ("bike_battery", "bike_needs_charge"):
+                        state["battery"][bike] = record["value"]
+                    elif event == "bike_lock_charging":
+                        state["station"][bike] = record["station"]
+                    elif event == "bike_unlock_charging":
+                        state["station"][bike] = -1
+                k += 1
+            yield time, {key: value.copy() for key, value in state.items()}
@@ -0,0 +1,49 @@
+import numpy as np
+
+
+class FleetStore:
+    # struct-of-arrays state of the fleet, indexed by bike id
+    # bikes read and write their state through it, so vectorized masks see it directly
+    def __init__(self, capacity=0):
+        self.size = 0
+        self.lon = np.zeros(capacity)
+        self.lat = np.zeros(capacity)
+        self.node = np.full(capacity, -1, dtype=np.int64)
+        self.busy = np.zeros(capacity, dtype=bool)
+        self.battery = np.full(capacity, np.nan)  # nan for bikes without battery
+        self.station_id = np.full(capacity, -1, dtype=np.int64)  # -1: not docked
+        self.user_id = np.full(capacity, -1, dtype=np.int64)  # -1: no user
+
+    def grow(self, capacity):
+        def extend(array, fill):
+            extended = np.full(capacity, fill, dtype=array.dtype)
+            extended[: len(array)] = array
+            return extended
+
+        self.lon = extend(self.lon, 0)
+        self.lat = extend(self.lat, 0)
+        self.node = extend(self.node, -1)
+        self.busy = extend(self.busy, False)
+        self.battery = extend(self.battery, np.nan)
+        self.station_id = extend(self.station_id, -1)
+        self.user_id = extend(self.user_id, -1)
+
+    def register(self, bike_id):
+        if bike_id >= len(self.busy):
+            self.grow(max(bike_id + 1, 2 * len(self.busy)))
+        self.size = max(self.size, bike_id + 1)
+
+    def set_location(self, bike_id, location):
+        self.lon[bike_id] = location.lon
+        self.lat[bike_id] = location.lat
+        self.node[bike_id] = -1 if location.node is None else location.node
+
+    def locations(self):
+        # [lon, lat, node] per bike
+        return np.column_stack([self.lon[: self.size], self.lat[: self.size], self.node[: self.size]])
+
+    def available(self, battery_min_level=None):
+        mask = ~self.busy[: self.size]
+        if battery_min_level is not None:
+            mask &= self.battery[: self.size] > battery_min_level
+        return mask
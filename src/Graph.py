@@ -2,10 +2,23 @@ import networkx as nx
 import pandana as pdna
 import numpy as np
 from scipy import spatial
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
 import pandas as pd
 from .Location import Location
+from .PathCache import PathCache
+from .PandanaRouter import PandanaRouter
+from . import Profiler
 import pickle
+import hashlib
+import json
 import os
+import time
+
+# bump when the layout of the on-disk graph store changes
+GRAPH_STORE_VERSION = 1
+GRAPH_STORE_ARRAYS = ["nodes", "indptr", "indices", "lengths"]
+
 
 class Graph:
     def __init__(self, name=None):
@@ -13,40 +26,141 @@ class Graph:
         if name is None:
             name = "greater_boston_road"
         self.name = name
+        self._G = None
+        self._network = None
         self.start()
-        pass
+        self.setup()
 
     def start(self):
         print("Loading graph")
-        if not hasattr(self, "G"):
-            self.load_graphml()
-            self.process_graph()
-            self.compute_nodes_edges()
-            self.create_kdtree_nodes()
+        self.load_graphml()
+        self.process_graph()
+        self.compute_nodes_edges()
+        self.create_kdtree_nodes()
+
+    def setup(self):
+        # runtime state that is never persisted with the graph
+        self.create_csgraph()
+        self.set_router()
+        self.set_path_cache()
+
+    @property
+    def G(self):
+        # networkx graph is only rebuilt from the CSR arrays when somebody needs it
+        if self._G is None:
+            self._G = self.build_graph()
+        return self._G
+
+    @G.setter
+    def G(self, G):
+        self._G = G
+
+    @property
+    def network(self):
+        # pandana network (and its contraction) is only built when a pandana query needs it
+        if self._network is None:
             self.create_network()
+        return self._network
 
-    def save(self):
-        file_h5 = os.path.join(self.path, self.name + ".h5")
-        self.network.save_hdf5(file_h5)
-        network = self.network
+    @network.setter
+    def network(self, network):
+        self._network = network
 
-        # network cannot be serialized with pickle (cython error)
-        self.network = None
-        file_pkl = os.path.join(self.path, self.name + ".pkl")
-        with open(file_pkl, "wb") as f:
-            pickle.dump(self, f)
-        self.network = network
+    def save(self):
+        # store: data/graph/<name>/{nodes,indptr,indices,lengths}.npy + graph.json
+        path = os.path.join(self.path, self.name)
+        os.makedirs(path, exist_ok=True)
+        for key in GRAPH_STORE_ARRAYS:
+            np.save(os.path.join(path, key + ".npy"), np.ascontiguousarray(getattr(self, key)))
+
+        # metadata is written last, a store without it is incomplete
+        meta = {
+            "version": GRAPH_STORE_VERSION,
+            "name": self.name,
+            "num_nodes": len(self.nodes),
+            "num_edges": len(self.indices),
+        }
+        with open(os.path.join(path, "graph.json"), "w") as f:
+            json.dump(meta, f)
 
     @staticmethod
     def load(name):
+        start = time.time()
         path = os.path.join("data", "graph")
+        if os.path.exists(os.path.join(path, name, "graph.json")):
+            graph = Graph.load_store(path, name)
+        else:
+            graph = Graph.load_pickle(path, name)
+        print("Graph %s loaded in %.3f s" % (name, time.time() - start))
+        return graph
+
+    @staticmethod
+    def load_store(path, name):
+        with open(os.path.join(path, name, "graph.json")) as f:
+            meta = json.load(f)
+        if meta["version"] != GRAPH_STORE_VERSION:
+            raise ValueError("Graph store %s has version %s, expected %s" % (name, meta["version"], GRAPH_STORE_VERSION))
+
+        graph = Graph.__new__(Graph)
+        graph.path = path
+        graph.name = name
+        graph._G = None
+        graph._network = None
+        for key in GRAPH_STORE_ARRAYS:
+            setattr(graph, key, np.load(os.path.join(path, name, key + ".npy"), mmap_mode="r"))
+        graph.edges = graph.edge_list()[2]
+        graph.create_kdtree_nodes()
+        graph.setup()
+        return graph
+
+    @staticmethod
+    def load_pickle(path, name):
+        # legacy format: pickled object + pandana network in hdf5
         file_pkl = os.path.join(path, name + ".pkl")
         with open(file_pkl, "rb") as f:
             graph = pickle.load(f)
+        graph._G = graph.__dict__.pop("G", None)
+        graph._network = graph.__dict__.pop("network", None)
+        if not hasattr(graph, "indptr"):
+            graph.compute_nodes_edges()
         file_h5 = os.path.join(path, name + ".h5")
         graph.network = pdna.Network.from_hdf5(file_h5)
+        graph.setup()
         return graph
 
+    def fingerprint(self):
+        # hash of the store layout and the graph arrays, tells apart rebuilds of a graph with the same name
+        if getattr(self, "_fingerprint", None) is None:
+            sha1 = hashlib.sha1(str(GRAPH_STORE_VERSION).encode())
+            for key in GRAPH_STORE_ARRAYS:
+                array = np.ascontiguousarray(getattr(self, key))
+                sha1.update(str(array.dtype).encode())
+                sha1.update(array.tobytes())
+            self._fingerprint = sha1.hexdigest()[:16]
+        return self._fingerprint
+
+    def set_router(self, router="pandana"):
+        # pandana: queries on the pandana network, itself a contraction hierarchy in C++ built with the network
+        if router != "pandana":
+            raise ValueError("Unknown router: %s" % router)
+        self.router = PandanaRouter(self)
+        self.router_name = router
+
+        # a new router starts from an empty path cache
+        if hasattr(self, "path_cache"):
+            self.set_path_cache(self.path_cache.size, self.path_cache.policy, self.path_cache.file is not None)
+
+    def set_path_cache(self, size=200000, policy="lru", persist=False):
+        # persisted caches are keyed by graph name and router: data/graph/<name>_<router>_paths.npz
+        file = None
+        if persist:
+            file = os.path.join(self.path, "%s_%s_paths.npz" % (self.name, self.router_name))
+        self.path_cache = PathCache(size, policy, file)
+        self.path_cache.load()
+
+    def save_path_cache(self):
+        self.path_cache.save()
+
     def load_graphml(self):
         # path = "./data/greater_boston_road.graphml"
         # path = "./data/greater_boston_walk.graphml"
@@ -67,25 +181,110 @@ class Graph:
         nodes_x = [float(x) for x in nx.get_node_attributes(self.G, "x").values()]
         nodes_y = [float(y) for y in nx.get_node_attributes(self.G, "y").values()]
         self.nodes = np.column_stack([nodes_x, nodes_y])
-        self.edges = [float(x) for x in nx.get_edge_attributes(self.G, "length").values()]
 
+        edges_df = nx.to_pandas_edgelist(self.G)
+        self.edges = edges_df["length"].values.astype(float)
+        self.compute_csr(edges_df["source"].values, edges_df["target"].values, self.edges)
+
+    def compute_csr(self, source, target, length):
+        # undirected adjacency, every edge stored in both directions (self-loops once)
+        n = len(self.nodes)
+        loop = source == target
+        rows = np.concatenate([source, target[~loop]])
+        cols = np.concatenate([target, source[~loop]])
+        weights = np.concatenate([length, length[~loop]])
+        order = np.lexsort((cols, rows))
+
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=self.indptr[1:])
+        self.indices = cols[order].astype(np.int32)
+        self.lengths = weights[order].astype(np.float64)
+
+    def edge_list(self):
+        # each undirected edge once, recovered from the CSR arrays
+        rows = np.repeat(np.arange(len(self.indptr) - 1, dtype=np.int32), np.diff(self.indptr))
+        keep = rows <= self.indices
+        return rows[keep], np.asarray(self.indices[keep]), np.asarray(self.lengths[keep])
+
+    def create_csgraph(self):
+        # scipy adds up duplicated entries, keep only the shortest of parallel edges
+        n = len(self.nodes)
+        rows = np.repeat(np.arange(n, dtype=np.int32), np.diff(self.indptr))
+        order = np.lexsort((self.lengths, self.indices, rows))
+        rows, cols, lengths = rows[order], np.asarray(self.indices)[order], np.asarray(self.lengths)[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+        self.csgraph = csr_matrix((lengths[first], (rows[first], cols[first])), shape=(n, n))
+
+    def build_graph(self):
+        source, target, length = self.edge_list()
+        G = nx.MultiGraph()
+        G.add_nodes_from((i, {"x": x, "y": y}) for i, (x, y) in enumerate(self.nodes.tolist()))
+        G.add_weighted_edges_from(zip(source.tolist(), target.tolist(), length.tolist()), weight="length")
+        return G
+
+    @Profiler.phase("kdtree")
     def create_kdtree_nodes(self):
         self.kdtree_nodes = spatial.cKDTree(self.nodes, leafsize=30)
 
+    @Profiler.phase("kdtree")
     def closest_node_kdtree(self, location, k=1):
         if not self.kdtree_nodes:
             self.create_kdtree_nodes()
         distance, closest = self.kdtree_nodes.query(location.get_loc(), k)
         return closest
 
+    @Profiler.phase("kdtree")
+    def closest_nodes_kdtree(self, locations, k=1):
+        # batched closest_node_kdtree over an array of [lon, lat]
+        if not self.kdtree_nodes:
+            self.create_kdtree_nodes()
+        distance, closest = self.kdtree_nodes.query(np.asarray(locations, dtype=np.float64).reshape(-1, 2), k)
+        return closest
+
+    @Profiler.phase("kdtree")
     def create_kdtree_stations(self, stations):
         self.kdtree_stations = spatial.KDTree(stations)
+        self.stations_radians = np.radians(self.kdtree_stations.data)  # [lon, lat] per station
 
     def precompute_stations_nodes(self, locations):
         pts = pd.DataFrame(locations, columns=["lon", "lat"])
-        self.stations_nodes = self.network.get_node_ids(pts.lon, pts.lat)
+        self.stations_nodes = self.get_node_ids(pts.lon, pts.lat)
         return self.stations_nodes
 
+    def stations_distance_matrix(self, nodes):
+        # dense station x station road distances, cached on disk by the graph and the station nodes
+        # the matrix is not kept on the graph, every simulation holds the one of its own stations
+        # float32 (half the memory and disk, mm precision up to 16 km), the dtype is part of the file name
+        nodes = np.asarray(nodes, dtype=np.int64)
+        key = hashlib.sha1(self.fingerprint().encode() + nodes.tobytes()).hexdigest()[:16]
+        file = os.path.join(self.path, self.name + "_stations_" + key + "_float32.npy")
+        if os.path.exists(file):
+            return np.load(file)
+        distances = self.distance_matrix(nodes, nodes).astype(np.float32)
+        Graph.save_array(file, distances)
+        return distances
+
+    def precompute_cells_distances(self, bounds, nodes):
+        # dense cell x cell road distances of the rebalancing grid, cached on disk by the graph, the cell bounds and their nodes
+        bounds = np.ascontiguousarray(bounds, dtype=np.float64)
+        nodes = np.asarray(nodes, dtype=np.int64)
+        key = hashlib.sha1(self.fingerprint().encode() + bounds.tobytes() + nodes.tobytes()).hexdigest()[:16]
+        file = os.path.join(self.path, self.name + "_cells_" + key + ".npy")
+        if os.path.exists(file):
+            return np.load(file)
+        distances = self.distance_matrix(nodes, nodes)
+        Graph.save_array(file, distances)
+        return distances
+
+    @staticmethod
+    def save_array(file, array):
+        # written to a temporary file first, concurrent sweep workers never read a partial one
+        tmp = file + ".%d.tmp" % os.getpid()
+        with open(tmp, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, file)
+
     def precompute_nearest_stations(self, locations, maxdist, maxitems):
         self.maxitems = maxitems
         pts = pd.DataFrame(locations, columns=["lon", "lat"])
@@ -93,10 +292,19 @@ class Graph:
             category="stations", maxdist=maxdist, maxitems=maxitems, x_col=pts.lon, y_col=pts.lat,
         )
 
-        self.nearest_stations = self.network.nearest_pois(distance=maxdist, category="stations", num_pois=maxitems, include_poi_ids=True,)
+        nearest_stations = self.network.nearest_pois(distance=maxdist, category="stations", num_pois=maxitems, include_poi_ids=True,).values
+        distances = nearest_stations[:, :maxitems]
+        stations_id = nearest_stations[:, maxitems : 2 * maxitems]
 
-        # TODO: preprocess data to fast query
+        # padded per-node arrays: stations found within maxdist first (sorted by road distance), -1/nan after
+        found = ~np.isnan(stations_id)
+        order = np.argsort(~found, axis=1, kind="stable")
+        found = np.take_along_axis(found, order, axis=1)
+        self.nearest_stations_count = found.sum(axis=1).astype(np.int32)
+        self.nearest_stations_id = np.where(found, np.take_along_axis(stations_id, order, axis=1), -1).astype(np.int32)
+        self.nearest_stations_distance = np.where(found, np.take_along_axis(distances, order, axis=1), np.nan).astype(np.float32)
 
+    @Profiler.phase("kdtree")
     def closest_station_kdtree(self, location, k=1):
         if not self.kdtree_stations:
             self.create_kdtree_stations()
@@ -104,75 +312,88 @@ class Graph:
         return closest
 
     def create_network(self):
+        start = time.time()
         nodes_df = pd.DataFrame(self.nodes, columns=["x", "y"])
-        edges_df = nx.to_pandas_edgelist(self.G)
+        source, target, length = self.edge_list()
+        edges_df = pd.DataFrame({"source": source, "target": target, "length": length})
 
         self.network = pdna.Network(nodes_df["x"], nodes_df["y"], edges_df["source"], edges_df["target"], edges_df[["length"]],)
         # self.network.precompute(500)
+        print("Pandana network built in %.3f s" % (time.time() - start))
 
     def route(self, from_lon, from_lat, to_lon, to_lat):
         from_location = Location(from_lon, from_lat)  # TODO: remove
         to_location = Location(to_lon, to_lat)  # TODO: remove
         return self.shortest_path(from_location, to_location)
 
+    def get_node_ids(self, lon, lat):
+        # nearest graph node of every point, as pandana's get_node_ids but without building the network
+        locations = np.column_stack([np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64)])
+        return self.closest_nodes_kdtree(locations).astype(np.int64)
+
     def closest_nodes(self, locations):
         lon = [loc.lon for loc in locations]
         lat = [loc.lat for loc in locations]
-        return self.network.get_node_ids(lon, lat)
+        return self.get_node_ids(lon, lat)
 
         coords = [loc.get_loc() for loc in locations]
         pts = pd.DataFrame(coords, columns=["lon", "lat"])
         return self.network.get_node_ids(pts.lon, pts.lat)
 
+    @Profiler.phase("routing")
     def shortest_path(self, from_location, to_location):
         from_closest, to_closest = self.closest_nodes([from_location, to_location])
-        return self.network.shortest_path(from_closest, to_closest)
+        return self.router.shortest_path(from_closest, to_closest)
 
+    @Profiler.phase("routing")
     def shortest_path_length(self, from_location, to_location):
         # from_closest, to_closest = self.closest_nodes([from_location, to_location])
-        return self.network.shortest_path_length(from_location.node, to_location.node)
-
-    # TODO: remove? review
-    def shortest_paths_multiple(self, from_locations, to_locations):
-        n_from, n_to = len(from_locations), len(to_locations)
-        closests = self.closest_nodes([from_locations, to_locations])
-
-        origs = [o for o in closests for d in closests]
-        dests = [d for o in closests for d in closests]
-        return self.network.shortest_path_lengths(np.tile(closests[:n_from], n_to), closests[n_from:])
-
-    # TODO: remove? review
+        a, b = from_location.node, to_location.node
+        distance = self.path_cache.get(a, b)
+        if distance is None:
+            distance = self.router.shortest_path_length(a, b)
+            self.path_cache.put(a, b, distance)
+        return distance
+
+    @Profiler.phase("routing")
+    def shortest_path_lengths(self, from_nodes, to_nodes):
+        return self.router.shortest_path_lengths(from_nodes, to_nodes)
+
+    @Profiler.phase("routing")
+    def distance_matrix(self, origins, destinations, chunk=2 ** 24):
+        # road distances from every origin to every destination node, repeated nodes are routed once
+        origins_unique, origins_inverse = np.unique(np.asarray(origins, dtype=np.int64), return_inverse=True)
+        destinations_unique, destinations_inverse = np.unique(np.asarray(destinations, dtype=np.int64), return_inverse=True)
+
+        if len(destinations_unique) < len(origins_unique):
+            # undirected graph: sweep from the smaller side
+            matrix = self.dijkstra_sweeps(destinations_unique, origins_unique, chunk).T
+        else:
+            matrix = self.dijkstra_sweeps(origins_unique, destinations_unique, chunk)
+        return np.ascontiguousarray(matrix[np.ix_(origins_inverse.ravel(), destinations_inverse.ravel())])
+
+    def dijkstra_sweeps(self, sources, targets, chunk):
+        # one-to-all dijkstra per source, in batches so at most chunk distances are held at once
+        matrix = np.empty((len(sources), len(targets)), dtype=np.float64)
+        batch = max(1, chunk // len(self.nodes))
+        for start in range(0, len(sources), batch):
+            distances = dijkstra(self.csgraph, directed=True, indices=sources[start : start + batch])
+            matrix[start : start + batch] = distances[:, targets]
+        return matrix
+
+    @Profiler.phase("station_lookup")
     def shortest_path_length_stations(self, from_location):
-        # OPTION A: return air-distance to k stations via kdtree
-        # distances, closests = self.kdtree_stations.query(from_location.get_loc(), 10)
-        # return closests, distances
-
-        # OPTION B: use precomputed poi and precomputed closest nodes
+        # stations reachable from the user node (precomputed pois) and their air-distance to the user
+        user_node = from_location.node
+        k = self.nearest_stations_count[user_node]
 
-        user_node = from_location.node  # self.closest_nodes([from_location])
-        k = min(10, self.maxitems)
-        k = self.maxitems
+        stations_id = self.nearest_stations_id[user_node, :k]
+        distances = self.nearest_stations_distance[user_node, :k]
 
-        distances = self.nearest_stations.values[user_node, :k]
-        stations_id = self.nearest_stations.values[user_node, self.maxitems : self.maxitems + k]
-
-        distances = distances[~np.isnan(stations_id)].tolist()
-        stations_id = stations_id[~np.isnan(stations_id)].astype(int).tolist()
-
-        user_location = np.radians(np.array(from_location.get_loc()))
-        stations_location = np.radians(self.kdtree_stations.data[stations_id])
-        air_distances = Graph.equirect(user_location[0], user_location[1], stations_location[:, 0], stations_location[:, 1],)
+        stations_location = self.stations_radians[stations_id]
+        air_distances = Graph.equirect(np.radians(from_location.lon), np.radians(from_location.lat), stations_location[:, 0], stations_location[:, 1],)
         return stations_id, distances, air_distances
 
-        # OPTION C: filter k air-nearest stations via kdtree + shortest-path via graph
-        k = 10
-        stations_id = self.closest_station_kdtree(from_location, k)
-        user_node = from_location.node  # self.closest_nodes([from_location])
-        distances = self.network.shortest_path_lengths(np.tile(user_node, k), self.stations_nodes[stations_id])
-        # print(stations_id, self.stations_nodes[stations_id], user_node, distances)
-        stations_id, distances = Graph.sort_lists(stations_id, distances, 1)
-        return stations_id, distances
-
     @staticmethod
     def sort_lists(x, y, key=0):
         tuples = zip(*sorted(zip(x, y), reverse=False, key=lambda v: v[key]))
@@ -0,0 +1,46 @@
+import numpy as np
+
+
+class GridIndex:
+    # cell of a batch of points in a lattice of [lon_lb, lon_ub] x [lat_lb, lat_ub] cells (the rebalancing grid)
+    # the columns and rows are found with searchsorted on their sorted bounds, no bikes x cells comparison
+    # the rounded bounds of neighbouring cells can overlap slightly, then the first cell of the grid wins
+    def __init__(self, grid):
+        self.n = len(grid)
+        self.lon_lb, self.lon_ub, columns = GridIndex.axis(grid.group_lon.values, grid.lon_lb.values, grid.lon_ub.values)
+        self.lat_lb, self.lat_ub, rows = GridIndex.axis(grid.group_lat.values, grid.lat_lb.values, grid.lat_ub.values)
+
+        # grid index of every (column, row), n where there is no cell
+        self.cells = np.full((len(self.lon_lb) + 1, len(self.lat_lb) + 1), self.n, dtype=np.int64)
+        self.cells[columns, rows] = grid.index.values
+
+    @staticmethod
+    def axis(groups, lb, ub):
+        # bounds of the distinct columns (or rows) sorted along the axis, and the position of every cell in them
+        groups, first, position = np.unique(groups, return_index=True, return_inverse=True)
+        order = np.argsort(lb[first], kind="stable")
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        return lb[first][order], ub[first][order], rank[position]
+
+    @staticmethod
+    def span(x, lb, ub):
+        # first and last position with lb < x < ub (first > last if there is none)
+        return np.searchsorted(ub, x, side="right"), np.searchsorted(lb, x, side="left") - 1
+
+    def lookup(self, lon, lat):
+        # grid index of the cell that contains every point, -1 if it is outside of the grid
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        column_first, column_last = GridIndex.span(lon, self.lon_lb, self.lon_ub)
+        row_first, row_last = GridIndex.span(lat, self.lat_lb, self.lat_ub)
+
+        cells = np.full(len(lon), self.n, dtype=np.int64)
+        inside = (column_first <= column_last) & (row_first <= row_last)
+        for column, row in [(column_first, row_first), (column_first, row_last), (column_last, row_first), (column_last, row_last)]:
+            cells = np.where(inside, np.minimum(cells, self.cells[column.clip(0), row.clip(0)]), cells)
+        return np.where(cells < self.n, cells, -1)
+
+    def count(self, cells):
+        # points per grid cell, from the result of lookup
+        return np.bincount(cells[cells >= 0], minlength=self.n)
@@ -0,0 +1,26 @@
+import numpy as np
+
+
+class PandanaRouter:
+    # routing backend on top of the pandana network (plain point-to-point queries)
+    # the network is taken from the graph on every query, so it is only built once a query needs it
+    def __init__(self, graph):
+        self.graph = graph
+
+    @property
+    def network(self):
+        return self.graph.network
+
+    def shortest_path_length(self, source, target):
+        return self.network.shortest_path_length(source, target)
+
+    def shortest_path_lengths(self, sources, targets):
+        return np.asarray(self.network.shortest_path_lengths(sources, targets))
+
+    def many_to_many(self, sources, targets):
+        n, m = len(sources), len(targets)
+        lengths = self.network.shortest_path_lengths(np.repeat(sources, m), np.tile(targets, n))
+        return np.asarray(lengths, dtype=np.float64).reshape(n, m)
+
+    def shortest_path(self, source, target):
+        return self.network.shortest_path(source, target)
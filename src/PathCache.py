@@ -0,0 +1,99 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PathCache:
+    # bounded cache of shortest path lengths between graph nodes
+    def __init__(self, size=200000, policy="lru", file=None):
+        if policy not in ("lru", "fifo"):
+            raise ValueError("Unknown eviction policy: %s" % policy)
+
+        self.size = size
+        self.policy = policy  # lru: evict least recently used / fifo: evict oldest insertion
+        self.file = file  # optional .npz file to persist the cache between runs
+
+        self.store = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.added = None  # new entries since track(), see merge
+
+    @staticmethod
+    def key(a, b):
+        # the graph is undirected, a->b and b->a share the same entry
+        if a <= b:
+            return (a, b)
+        return (b, a)
+
+    def get(self, a, b):
+        key = PathCache.key(a, b)
+        value = self.store.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.policy == "lru":
+            self.store.move_to_end(key)
+        return value
+
+    def put(self, a, b, value):
+        if self.size <= 0:
+            return
+        self.store[PathCache.key(a, b)] = value
+        if self.added is not None:
+            self.added.append((a, b, value))
+        if len(self.store) > self.size:
+            self.store.popitem(last=False)
+
+    def track(self):
+        # keep the entries put from now on, so a forked worker can send them back to the parent
+        self.added = []
+
+    def merge(self, entries):
+        for a, b, value in entries:
+            self.put(a, b, value)
+
+    def clear(self):
+        self.store.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "policy": self.policy,
+            "entries": len(self.store),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate(),
+        }
+
+    def load(self):
+        if self.file is None or not os.path.exists(self.file):
+            return
+        data = np.load(self.file)
+        # entries are saved oldest first, keep the most recent ones if the cache shrank
+        start = max(0, len(data["length"]) - self.size)
+        for a, b, length in zip(data["a"][start:].tolist(), data["b"][start:].tolist(), data["length"][start:].tolist()):
+            self.store[(a, b)] = length
+
+    def save(self):
+        if self.file is None:
+            return
+        n = len(self.store)
+        a = np.fromiter((key[0] for key in self.store.keys()), dtype=np.int64, count=n)
+        b = np.fromiter((key[1] for key in self.store.keys()), dtype=np.int64, count=n)
+        length = np.fromiter(self.store.values(), dtype=np.float64, count=n)
+
+        # write aside and rename, so readers never see a half written file
+        tmp = self.file + ".%d.tmp" % os.getpid()
+        with open(tmp, "wb") as f:
+            np.savez(f, a=a, b=b, length=length)
+        os.replace(tmp, self.file)
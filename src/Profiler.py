@@ -0,0 +1,69 @@
+import sys
+import time
+import functools
+
+# cumulative timers and call counts of the hot paths, grouped in phases
+# hot functions are tagged where they are defined:
+#     @Profiler.phase("routing")
+#     def shortest_path_length(self, a, b):
+# the tag leaves the function untouched, configure(True) swaps the tagged methods for timed wrappers
+# (and configure(False) puts the originals back), so a run without profiling pays nothing
+# phases nest (event_dispatch includes everything run from the event callbacks)
+
+tagged = []  # functions tagged with phase
+wrapped = {}  # (class, name) -> original function, while profiling
+counters = {}  # "Class.function" -> [phase, calls, seconds]
+
+
+def phase(name):
+    def tag(function):
+        function.profile_phase = name
+        tagged.append(function)
+        return function
+
+    return tag
+
+
+def configure(enabled):
+    # counters start from zero on every run
+    counters.clear()
+    for (owner, name), function in wrapped.items():
+        setattr(owner, name, function)
+    wrapped.clear()
+    if enabled:
+        for function in tagged:
+            owner = getattr(sys.modules[function.__module__], function.__qualname__.split(".")[0])
+            wrapped[(owner, function.__name__)] = function
+            setattr(owner, function.__name__, timed(function))
+
+
+def enabled():
+    return len(wrapped) > 0
+
+
+def timed(function):
+    counter = counters.setdefault(function.__qualname__, [function.profile_phase, 0, 0.0])
+    clock = time.perf_counter
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            counter[1] += 1
+            counter[2] += clock() - start
+
+    return wrapper
+
+
+def report():
+    # {"phases": {phase: {calls, time}}, "functions": {name: {phase, calls, time}}}, times in seconds
+    phases = {}
+    functions = {}
+    for name, (phase, calls, seconds) in sorted(counters.items()):
+        functions[name] = {"phase": phase, "calls": calls, "time": seconds}
+        totals = phases.setdefault(phase, {"calls": 0, "time": 0.0})
+        totals["calls"] += calls
+        totals["time"] += seconds
+    return {"phases": phases, "functions": functions}
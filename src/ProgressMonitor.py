@@ -0,0 +1,65 @@
+import os
+import json
+import time
+
+import simpy
+
+
+class ProgressMonitor:
+    # reports the progress of a run every `every` simulated minutes, to stdout and to progress.jsonl
+    def __init__(self, env, engine, every, path):
+        self.env = env
+        self.engine = engine
+        self.every = every  # [min]
+        self.file = os.path.join(path, "progress.jsonl")
+        self.out = open(self.file, "w")
+        self.process = None
+
+        self.started = time.time()
+        self.last_wall = self.started
+        self.last_events = 0
+
+    def start(self):
+        self.process = self.env.process(self.monitor())
+
+    def stop(self):
+        if self.process is not None and self.process.is_alive:
+            self.process.interrupt()
+
+    def monitor(self):
+        try:
+            while True:
+                yield self.env.timeout(self.every * 60)
+                self.report()
+        except simpy.Interrupt:
+            pass
+
+    def status(self):
+        now = time.time()
+        events = self.env.events_processed
+        status = {
+            "sim_time": self.env.now,
+            "wall_time": now - self.started,
+            "events": events,
+            "events_per_s": (events - self.last_events) / max(now - self.last_wall, 1e-9),  # since the last report
+            "users_active": self.engine.users_active,
+            "bikes_busy": int(self.engine.fleet.busy.sum()),
+            "queue": self.env.events_pending,  # scheduled events not processed yet
+        }
+        self.last_wall = now
+        self.last_events = events
+        return status
+
+    def report(self):
+        status = self.status()
+        self.out.write(json.dumps(status) + "\n")
+        self.out.flush()  # readable while the run goes on
+        print(
+            "[%d] wall %.1fs, %d events (%.0f/s), %d users active, %d bikes busy, %d queued"
+            % (status["sim_time"], status["wall_time"], status["events"], status["events_per_s"], status["users_active"], status["bikes_busy"], status["queue"])
+        )
+
+    def close(self):
+        # last report at the end of the run
+        self.report()
+        self.out.close()
@@ -1,11 +1,16 @@
 import os
-import logging
-from numpy.lib.function_base import select
 
+import simpy
 import pandas as pd
 import numpy as np
 from scipy.optimize import linprog
+from scipy import sparse
 from .Location import Location
+from .GridIndex import GridIndex
+from .DemandCube import DemandCube
+from .TransportationSolver import TransportationSolver
+from . import Trace
+from . import Profiler
 
 
 class RebalancingManager:
@@ -24,8 +29,13 @@ class RebalancingManager:
         self.predict_ahead = config["REBALANCING_AHEAD"] # [min]
         self.predict_window = config["REBALANCING_WINDOW"] # [min]
         self.battery_min_level = config["BATTERY_MIN_LEVEL"] # [%]
+        self.solver = config.get("REBALANCING_SOLVER", "transport")  # transport (integral, warm started) / lp
+        self.nearest = config.get("REBALANCING_NEAREST", -1)  # cells every cell can send bikes to, -1 for all
 
-        print("Loading Rebalancing")
+        self.process = None
+
+        if Trace.REBALANCING:
+            Trace.emit("rebalancing_loading", self.env.now)
 
         path = os.path.join("data", "demand_grid.csv")
         self.demand = pd.read_csv(path, index_col=0)
@@ -40,23 +50,42 @@ class RebalancingManager:
         # self.demand.set_index(["group_lon", "group_lat"], drop=False)
 
         self.idx = pd.MultiIndex.from_arrays([self.grid.group_lon, self.grid.group_lat])
+        self.grid_index = GridIndex(self.grid)
+        self.demand_cube = DemandCube(self.demand, self.grid)
         
 
-        self.routing = Routing(self.grid, self.graph)
-
-        print("Done Rebalancing")
+        if Trace.REBALANCING:
+            Trace.emit("routing_loading", self.env.now)
+        self.routing = Routing(self.grid, self.graph, self.solver, self.nearest)
+        if Trace.REBALANCING:
+            Trace.emit("routing_loaded", self.env.now)
+            Trace.emit("rebalancing_loaded", self.env.now)
 
 
-    def set_bikes(self, bikes):
+    def set_bikes(self, bikes, fleet):
         self.bikes = bikes
+        self.fleet = fleet
 
     def start(self):
-        self.env.process(self.predictive_demand())
+        self.process = self.env.process(self.predictive_demand())
+
+    def stop(self):
+        if self.process is not None and self.process.is_alive:
+            self.process.interrupt()
 
     def predictive_demand(self):
-        print("Rebalancing ongoing")
+        if Trace.REBALANCING:
+            Trace.emit("rebalancing_started", self.env.now)
+        try:
+            yield from self.rebalance()
+        except simpy.Interrupt:
+            if Trace.REBALANCING:
+                Trace.emit("rebalancing_stopped", self.env.now)
+
+    def rebalance(self):
         while True:
-            logging.info("[%.2f] Demand check" % (self.env.now))
+            if Trace.REBALANCING:
+                Trace.emit("demand_check", self.env.now)
 
             window_start = self.env.now + self.predict_ahead * 60
             window_stop  = window_start + self.predict_window * 60
@@ -66,11 +95,7 @@ class RebalancingManager:
             #     "demand": np.zeros(self.n),
             #     "bikes": np.zeros(self.n)
             # }, index = self.idx)
-            bikes_vector = np.zeros(self.n, dtype=np.int)
-
-            subset = self.demand.loc[window_start:window_stop]
-            subset = pd.concat([subset, self.grid], axis=0, join="outer", ignore_index=True, sort=False)
-            demand_vector = subset.groupby(["group_lon", "group_lat"]).size().values - 1
+            demand_vector = self.demand_cube.window(window_start, window_stop)
             # subset = subset.set_index(["group_lon", "group_lat"])
             # subset = subset.merge(data, how="right", left_index=True, right_index=True)
             # demand_vector = subset.groupby(level=[0,1]).size().values-1  
@@ -79,25 +104,12 @@ class RebalancingManager:
 
 
 
-            bikes_id = []
-            bikes_cell = []
-            for bike in self.bikes:
-                if not bike.busy and bike.battery.level > self.battery_min_level:
-                    lon = bike.location.lon
-                    lat = bike.location.lat
-                    cond = (lon > self.grid.lon_lb.values) & (lon < self.grid.lon_ub.values) & (lat > self.grid.lat_lb.values) & (lat < self.grid.lat_ub.values)
-                    row = self.grid.index[cond].tolist()
-
-                    if len(row) > 0:
-                        # bike.grid_id = row[0]
-                        
-                        bikes_id.append(bike.id)
-                        bikes_cell.append(row[0])
-
-                        bikes_vector[row[0]] += 1
-            
-            bikes_id = np.array(bikes_id)
-            bikes_cell = np.array(bikes_cell)
+            # available bikes and the first grid cell that contains each of them (bikes x cells mask)
+            bikes_id = np.flatnonzero(self.fleet.available(self.battery_min_level))
+            bikes_cell = self.grid_index.lookup(self.fleet.lon[bikes_id], self.fleet.lat[bikes_id])
+            bikes_id = bikes_id[bikes_cell >= 0]
+            bikes_cell = bikes_cell[bikes_cell >= 0]
+            bikes_vector = self.grid_index.count(bikes_cell)
             
             
 
@@ -142,12 +154,13 @@ class RebalancingManager:
                     lat = np.random.uniform(cell_to.lat_lb, cell_to.lat_ub)
                     # lon = (cell_to.lon_lb + cell_to.lon_ub)/2
                     # lat = (cell_to.lat_lb + cell_to.lat_ub)/2
-                    node = self.graph.network.get_node_ids([lon], [lat])[0]
+                    node = self.graph.get_node_ids([lon], [lat])[0]
                     destination = Location(lon, lat, node)    
                 
                     if not self.bikes[bike_id].busy:
-                        logging.info("[%.2f] Rebalancing bike %d" % (self.env.now, bike_id))
-                        self.env.process(self.ui.autonomous_drive(bike_id, destination, user_id=-1, magic=False, rebalancing=True, liberate=True, charge=True))
+                        if Trace.REBALANCING:
+                            Trace.emit("rebalancing_bike", self.env.now, bike_id)
+                        self.env.process(self.ui.autonomous_drive(bike_id, destination, user_id=-1, instant=False, rebalancing=True, liberate=True, charge=True))
                         
 
             # WITH ROUTING OPTIMIZATION
@@ -183,18 +196,17 @@ class RebalancingManager:
 
 class Routing:
 
-    def __init__(self, grid, graph):
+    def __init__(self, grid, graph, solver="transport", nearest=-1):
         
         self.grid = grid
         self.graph = graph
+        self.solver = solver
 
         self.n = len(grid)
 
-        print("Loading Routing")
-
         self.grid["lon"] = (self.grid.lon_lb + self.grid.lon_ub)/2
         self.grid["lat"] = (self.grid.lat_lb + self.grid.lat_ub)/2
-        self.grid["node"] = self.graph.network.get_node_ids(self.grid.lon, self.grid.lat)
+        self.grid["node"] = self.graph.get_node_ids(self.grid.lon, self.grid.lat)
         self.grid["location"] = None
         self.grid["location"] = self.grid.apply(lambda x: Location(x.lon, x.lat, x.node), axis=1)
         # for i in range(len(self.grid)):
@@ -205,22 +217,19 @@ class Routing:
         self.cost = np.concatenate([self.dist.flatten(), self.slack])
 
         self.A = self.get_A()
-
-        print("Done Routing")
+        self.transportation = TransportationSolver(self.dist, nearest)
 
 
     def get_A(self):
+        # sparse constraints, 2n rows and n^2 + n columns (flows i -> j at i*n + j, then the slacks)
+        # rows 0..n-1: bikes leaving cell i <= bikes in i
+        # rows n..2n-1: -(bikes arriving to cell i) - slack i <= -demand of i
         n = self.n
-        A = np.zeros((2*n, n**2 + n))
-
-        for i in range(n):
-            for j in range(n):
-                A[i, i*n + j] = 1
-
-                A[n+i, j*n + i] = -1
-
-            A[n+i, n**2 + i] = -1
-        return A
+        i, j = np.divmod(np.arange(n**2), n)
+        rows = np.concatenate([i, n + j, n + np.arange(n)])
+        cols = np.concatenate([np.arange(n**2), np.arange(n**2), n**2 + np.arange(n)])
+        values = np.concatenate([np.ones(n**2), -np.ones(n**2 + n)])
+        return sparse.csr_matrix((values, (rows, cols)), shape=(2*n, n**2 + n))
 
     def get_b(self, bikes, demand):
         n = self.n
@@ -232,20 +241,19 @@ class Routing:
 
 
     def compute_distances(self):
-        n = self.n
-        dist = np.empty((n, n))
-        for i in range(n):
-            for j in range(n):
-                if i == j:
-                    dist[i,j] = 0
-                else:
-                    a = self.grid.location[i]
-                    b = self.grid.location[j]
-                    # dist[i,j] = np.sqrt((a.lon-b.lon)**2 + (a.lat-b.lat)**2)
-                    dist[i,j] = self.graph.shortest_path_length(a, b)/1000
+        # cell x cell road distances [km], batched routing between the cell nodes, cached on disk per grid
+        bounds = self.grid[["lon_lb", "lon_ub", "lat_lb", "lat_ub"]].values
+        dist = self.graph.precompute_cells_distances(bounds, self.grid.node.values) / 1000
+        np.fill_diagonal(dist, 0)
         return dist
 
+    @Profiler.phase("rebalancing_lp")
     def optimize(self, demand, bikes):
+        if self.solver == "transport":
+            s = self.transportation.solve(bikes, demand)
+            np.fill_diagonal(s, 0)
+            return s
+
         n = self.n
         cost = self.cost
         A = self.A
@@ -2,16 +2,48 @@ import os
 import datetime
 import json
 import logging
+import queue
+import sqlite3
+import time
+import uuid
 from .UserTrip import UserTrip
 from .BikeTrip import BikeTrip
+from .TripSink import TripSink
+from .AsyncWriter import AsyncWriter, BlockingQueueHandler, BlockingQueueListener
+from . import Trace
+from . import Profiler
+from .EventLog import EventLog
 
 
 class Results:
     def __init__(self, config):
-        self.user_trips_name = "user_trips.csv"
-        self.bike_trips_name = "bike_trips.csv"
+        self.RESULTS_FORMAT = config.get("RESULTS_FORMAT", "csv")  # csv / csv.gz / parquet
+        self.RESULTS_BATCH = config.get("RESULTS_BATCH", 65536)  # trips buffered per write
+        self.RESULTS_ASYNC = config.get("RESULTS_ASYNC", False)  # write trips and log on a background thread
+        self.RESULTS_QUEUE = config.get("RESULTS_QUEUE", 8)  # pending batches before the simulation waits
+        self.TRACE_FORMAT = config.get("TRACE_FORMAT", "text")  # trace events to app.log (text), events.bin (binary) or both
+
+        self.user_trips_name = "user_trips"
+        self.bike_trips_name = "bike_trips"
         self.config_name = "config.json"
+        self.profile_name = "profile.json"
         self.log_name = "app.log"
+        self.events_name = "events.bin"
+        self.manifest_path = os.path.join(os.getcwd(), "results", "runs.sqlite")
+
+        self.config = config
+        self.started = time.time()
+        self.closed = False
+        self.io = AsyncWriter(self.RESULTS_QUEUE) if self.RESULTS_ASYNC else None
+        self.log_listener = None
+        self.event_log = None
+
+        # summary kpis, accumulated while the trips are written
+        self.users = 0
+        self.users_served = 0
+        self.bike_trips_count = 0
+        self.time_sums = dict.fromkeys(["time_walk_origin", "time_ride", "time_wait", "time_walk_destination"], 0.0)
+        self.time_counts = dict.fromkeys(self.time_sums, 0)
 
         self.mkpath()
         self.mkdir()
@@ -22,36 +54,73 @@ class Results:
         self.open_bike_trips()
 
     def mkpath(self):
+        # unique across processes: parallel runs start within the same second
         cwd = os.getcwd()
         now = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        self.path = os.path.join(cwd, "results", now)
+        self.run_id = "%s_%d_%s" % (now, os.getpid(), uuid.uuid4().hex[:8])
+        self.path = os.path.join(cwd, "results", self.run_id)
 
     def mkdir(self):
-        os.mkdir(self.path)
+        os.makedirs(self.path, exist_ok=False)
 
     def setup_log(self):
+        # the trace events end up in app.log, without tracing only warnings do
         for handler in logging.root.handlers[:]:
             logging.root.removeHandler(handler)
         logging.basicConfig(
-            filename=os.path.join(self.path, self.log_name), filemode="w", format="%(message)s", level=logging.INFO,
+            filename=os.path.join(self.path, self.log_name), filemode="w", format="%(message)s", level=logging.INFO if Trace.enabled() else logging.WARNING,
         )
+        if Trace.enabled():
+            if self.TRACE_FORMAT in ("text", "both"):
+                Trace.sinks.append(Trace.log_sink)
+            if self.TRACE_FORMAT in ("binary", "both"):
+                self.event_log = EventLog(os.path.join(self.path, self.events_name), io=self.io)
+                Trace.sinks.append(self.event_log)
+        if self.RESULTS_ASYNC:
+            # the file handler moves to a listener thread, the simulation only enqueues the records
+            self.log_handler = logging.root.handlers[0]
+            log_queue = queue.Queue(maxsize=self.RESULTS_QUEUE * 4096)
+            logging.root.removeHandler(self.log_handler)
+            logging.root.addHandler(BlockingQueueHandler(log_queue))
+            self.log_listener = BlockingQueueListener(log_queue, self.log_handler)
+            self.log_listener.start()
+
+    def close_log(self):
+        if self.log_listener is None:
+            return
+        # drain the queue, later records go straight to the file again
+        self.log_listener.stop()
+        for handler in logging.root.handlers[:]:
+            logging.root.removeHandler(handler)
+        logging.root.addHandler(self.log_handler)
+        self.log_listener = None
 
     def open_user_trips(self):
-        self.user_trips = open(os.path.join(self.path, self.user_trips_name), "a")
-        self.user_trips.write(UserTrip.get_header())
+        self.user_trips = TripSink(self.path, self.user_trips_name, UserTrip.header, UserTrip.dtypes, self.RESULTS_FORMAT, self.RESULTS_BATCH, self.io)
 
     def add_user_trip(self, user_trip):
-        self.user_trips.write(user_trip.get_data())
+        self.user_trips.add(user_trip.store)
+
+        # unset fields are "" (or None when a step never happened, or nan when it was computed from one)
+        self.users += 1
+        bike_id = user_trip.store["bike_id"]
+        if bike_id not in ("", None) and bike_id == bike_id:
+            self.users_served += 1
+        for key in self.time_sums:
+            value = user_trip.store[key]
+            if value not in ("", None) and value == value:
+                self.time_sums[key] += value
+                self.time_counts[key] += 1
 
     def close_user_trips(self):
         self.user_trips.close()
 
     def open_bike_trips(self):
-        self.bike_trips = open(os.path.join(self.path, self.bike_trips_name), "a")
-        self.bike_trips.write(BikeTrip.get_header())
+        self.bike_trips = TripSink(self.path, self.bike_trips_name, BikeTrip.header, BikeTrip.dtypes, self.RESULTS_FORMAT, self.RESULTS_BATCH, self.io)
 
     def add_bike_trip(self, bike_trip):
-        self.bike_trips.write(bike_trip.get_data())
+        self.bike_trips.add(bike_trip.store)
+        self.bike_trips_count += 1
 
     def close_bike_trips(self):
         self.bike_trips.close()
@@ -60,6 +129,65 @@ class Results:
         with open(os.path.join(self.path, self.config_name), "w") as f:
             json.dump(config, f)
 
-    def close(self):
+    def save_profile(self, stats):
+        profile = Profiler.report()
+        profile["stats"] = stats
+        with open(os.path.join(self.path, self.profile_name), "w") as f:
+            json.dump(profile, f, indent=4)
+
+    def kpis(self):
+        kpis = {
+            "users": self.users,
+            "users_served": self.users_served,
+            "bike_trips": self.bike_trips_count,
+        }
+        for key in self.time_sums:
+            kpis["mean_" + key] = self.time_sums[key] / self.time_counts[key] if self.time_counts[key] > 0 else None
+        return kpis
+
+    def save_manifest(self, stats):
+        # one row per run; config keys become (indexed) columns the first time they show up
+        row = {"run_id": self.run_id, "path": self.path, "started": self.started, "wall_time": time.time() - self.started}
+        row.update(stats)
+        row.update(self.kpis())
+        for key, value in self.config.items():
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value)
+            elif hasattr(value, "item"):  # numpy scalars
+                value = value.item()
+            row[key] = value
+
+        with sqlite3.connect(self.manifest_path, timeout=60) as db:
+            db.execute('CREATE TABLE IF NOT EXISTS runs ("run_id" TEXT PRIMARY KEY)')
+            columns = set(column[1] for column in db.execute("PRAGMA table_info(runs)"))
+            for key in row:
+                if key in columns:
+                    continue
+                try:
+                    db.execute('ALTER TABLE runs ADD COLUMN "%s"' % key)
+                except sqlite3.OperationalError as e:
+                    if "duplicate column" not in str(e):  # added by a parallel run meanwhile
+                        raise
+                if key in self.config or key == "cache_key":  # cache_key: run cache lookups
+                    db.execute('CREATE INDEX IF NOT EXISTS "runs_%s" ON runs ("%s")' % (key, key))
+            keys = list(row.keys())
+            db.execute(
+                'INSERT INTO runs (%s) VALUES (%s)' % (", ".join('"%s"' % key for key in keys), ", ".join("?" * len(keys))), [row[key] for key in keys],
+            )
+        db.close()
+
+    def close(self, stats=None):
+        if self.closed:
+            return
+        self.closed = True
         self.close_user_trips()
         self.close_bike_trips()
+        if self.event_log is not None:
+            Trace.sinks.remove(self.event_log)
+            self.event_log.close()
+        if self.io is not None:
+            self.io.close()  # everything submitted is on disk after this
+        self.close_log()
+        if Profiler.enabled():
+            self.save_profile(stats or {})
+        self.save_manifest(stats or {})
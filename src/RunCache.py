@@ -0,0 +1,75 @@
+import os
+import json
+import sqlite3
+import hashlib
+
+# config keys that change what a run reports or how it writes it, not what it simulates
+# they are left out of the key and the seed: a sweep rerun with tracing or profiling on reuses the runs
+# (a reused run keeps the results format it was written with)
+REPORTING_KEYS = ["TRACE", "TRACE_FORMAT", "PROFILE", "PROGRESS_EVERY", "RESULTS_FORMAT", "RESULTS_BATCH", "RESULTS_ASYNC", "RESULTS_QUEUE"]
+
+
+class RunCache:
+    # content addressed index of finished runs: hash(config, input files, seed) -> results directory
+    # the keys are looked up in the run manifest (see Results.save_manifest), runs record theirs as cache_key
+    def __init__(self, file=None):
+        self.file = file or os.path.join("results", "runs.sqlite")
+        self.file_hashes = {}  # (path, size, mtime) -> sha1 of the content
+
+    @staticmethod
+    def canonical(config):
+        # same config regardless of key order or 5 vs 5.0
+        def normalize(value):
+            if isinstance(value, dict):
+                return {str(k): normalize(v) for k, v in value.items()}
+            if isinstance(value, (list, tuple)):
+                return [normalize(v) for v in value]
+            if isinstance(value, float) and value.is_integer():
+                return int(value)
+            if hasattr(value, "item"):  # numpy scalars
+                return normalize(value.item())
+            return value
+
+        return json.dumps(normalize(config), sort_keys=True, separators=(",", ":"))
+
+    @staticmethod
+    def outcome(config):
+        # the keys of a config that change the simulated outcome
+        return {key: value for key, value in config.items() if key not in REPORTING_KEYS}
+
+    @staticmethod
+    def seed(config):
+        # default seed of a config, stable across processes and sessions
+        return int(hashlib.sha1(RunCache.canonical(RunCache.outcome(config)).encode()).hexdigest()[:8], 16)
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        stamp = (path, stat.st_size, stat.st_mtime_ns)
+        if stamp not in self.file_hashes:
+            sha1 = hashlib.sha1()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    sha1.update(block)
+            self.file_hashes[stamp] = sha1.hexdigest()
+        return self.file_hashes[stamp]
+
+    def key(self, config, files, seed, **params):
+        # params: anything else that changes the outcome (simulated horizon, graph fingerprint...)
+        inputs = {os.path.basename(path): self.file_hash(path) for path in files}
+        content = RunCache.canonical({"config": RunCache.outcome(config), "inputs": inputs, "seed": seed, "params": params})
+        return hashlib.sha1(content.encode()).hexdigest()
+
+    def get(self, key):
+        # results directory of the latest finished run, None if it was never run or its results are gone
+        if not os.path.exists(self.file):
+            return None
+        db = sqlite3.connect(self.file, timeout=60)
+        try:
+            row = db.execute('SELECT path FROM runs WHERE cache_key = ? ORDER BY started DESC LIMIT 1', (key,)).fetchone()
+        except sqlite3.OperationalError:  # no runs table or no run recorded a key yet
+            row = None
+        finally:
+            db.close()
+        if row is None or not os.path.isdir(row[0]):
+            return None
+        return row[0]
@@ -6,6 +6,7 @@ import pandas as pd
 import logging
 import json
 import os
+import time
 
 # CLASSES
 from .Station import Station
@@ -19,14 +20,20 @@ from .UserDockless import UserDockless
 from .UserAutonomous import UserAutonomous
 
 from .DataInterface import DataInterface
+from .FleetStore import FleetStore
 from .Location import Location
 from .Graph import Graph
 from .RebalancingManager import RebalancingManager
 from .Results import Results
+from .CountingEnvironment import CountingEnvironment
+from .ProgressMonitor import ProgressMonitor
+from . import Trace
+from . import Profiler
 
 
 class SimulationEngine:
     def __init__(self, config, stations_data, users_data, graph=None):
+        start = time.time()
         self.config = config
         self.stations_data = stations_data
         self.users_data = users_data
@@ -34,31 +41,67 @@ class SimulationEngine:
         self.MODE = self.config["MODE"]  # 0 for StationBased / 1 for Dockless / 2 for Autonomous
         self.NUM_BIKES = self.config["NUM_BIKES"]
         self.REBALANCING_EVERY = self.config["REBALANCING_EVERY"]
+        self.STATIONS_DISTANCE_MATRIX = self.config.get("STATIONS_DISTANCE_MATRIX", self.MODE == 0)
+        self.TRACE = self.config.get("TRACE", {})  # trace levels per subsystem, e.g. {"ALL": "INFO"} (default off)
+        Trace.configure(self.TRACE)
+        self.PROFILE = self.config.get("PROFILE", False)  # time the hot paths, written to profile.json
+        Profiler.configure(self.PROFILE)
+        self.PROGRESS_EVERY = self.config.get("PROGRESS_EVERY", -1)  # [min] progress reports, -1 for none
 
 
-        self.env = simpy.Environment()
+        self.env = CountingEnvironment()
         if graph is None:
             self.graph = Graph()
         else:
             self.graph = graph
         self.ui = DataInterface(self.env, self.graph, self.config)
+        self.results = Results(self.config)  # before the managers, its trace sinks get their setup events
 
+        self.rebalancer = None
         if self.MODE == 2 and self.REBALANCING_EVERY > 0:
             self.rebalancer = RebalancingManager(self.env, self.config, self.graph, self.ui)
             
-        self.results = Results(self.config)
 
         self.stations = []
         self.bikes = []
-        self.users = []
+        self.users_active = 0  # users created and not finished yet
+        self.users_arrived = False  # all the users of the trip table have been created
+        self.fleet = FleetStore(int(self.stations_data["Bikes"].sum()))
+        self.monitor = None
+        self.end_time = None  # simulated time when the demand was exhausted
+        self.finished = self.env.event()  # all users done and no bike moving on its own, stops the run
+        self.finished.callbacks.append(simpy.core.StopSimulation.callback)
 
         self.start()
+        self.construction_time = time.time() - start  # [s] wall time to build the simulation
+        self.run_time = 0  # [s] wall time spent in run
 
     def run(self, until):
+        # can be called again to continue the simulation, the results stay open until finish()
         # print("Simulation Started")
+        start = time.time()
         self.env.run(until)
+        self.run_time += time.time() - start
         # print("Simulation Finished")
 
+    def finish(self, **fields):
+        # closes the results and records the run in the manifest, fields are extra manifest columns
+        if self.monitor is not None:
+            self.monitor.close()
+            self.monitor = None
+        stats = self.stats()
+        stats.update(fields)
+        self.results.close(stats)
+
+    def stats(self):
+        return {
+            "construction_time": self.construction_time,
+            "run_time": self.run_time,
+            "events": self.env.events_processed,
+            "sim_time": self.env.now,
+            "end_time": self.end_time,
+        }
+
     def step(self):
         self.env.step()
 
@@ -66,6 +109,10 @@ class SimulationEngine:
         if self.MODE != 1:
             self.init_stations()
         self.init_bikes()
+        if Trace.BIKE >= Trace.DEBUG:
+            # initial fleet state, the starting point of an event log replay
+            for bike_id in range(self.fleet.size):
+                Trace.emit("bike_state", self.env.now, bike_id, self.fleet.lon[bike_id], self.fleet.lat[bike_id], self.fleet.station_id[bike_id], self.fleet.battery[bike_id])
         self.init_managers()
         self.init_users()
 
@@ -73,72 +120,106 @@ class SimulationEngine:
         Station.reset()
         nodes = self.stations_data[["Longitude", "Latitude"]].values
         self.stations_data["Node"] = self.graph.precompute_stations_nodes(nodes)  # precompute closest graph nodes to each station
-        for _, station in self.stations_data.iterrows():
+        for lon, lat, node, docks in zip(nodes[:, 0].tolist(), nodes[:, 1].tolist(), self.stations_data["Node"].values.tolist(), self.stations_data["Docks"].values.tolist()):
             s = Station(self.env)
-            s.set_capacity(station["Docks"])
-            s.set_location(Location(station["Longitude"], station["Latitude"], station["Node"]))
+            s.set_capacity(docks)
+            s.set_location(Location(lon, lat, node))
             self.stations.append(s)
 
         self.graph.create_kdtree_stations(nodes)  # create kdtree for stations
 
+        if self.STATIONS_DISTANCE_MATRIX:
+            stations_nodes = self.stations_data["Node"].values
+            self.ui.set_stations_distances(stations_nodes, self.graph.stations_distance_matrix(stations_nodes))  # station x station road distances
+
         maxdist = 5000
         maxitems = 20
         self.graph.precompute_nearest_stations(nodes, maxdist, maxitems)  # set poi-s
 
     def init_bikes(self):
+        # station of every bike, in bike id order
+        bikes_station = np.repeat(np.arange(len(self.stations_data)), self.stations_data["Bikes"].values)
         if self.MODE == 0:
             BikeStation.reset()
-            for station_id, station in self.stations_data.iterrows():
-                for i in range(station["Bikes"]):
-                    bike = BikeStation(self.env, self.graph, self.config)
-                    bike.attach_station(station_id)  # saves the station in the bike
-                    bike.set_location(self.stations[station_id].location)
-                    self.stations[station_id].attach_bike(bike.id)  # saves the bike in the station
-                    self.bikes.append(bike)
-        elif self.MODE == 1:
+            for station_id in bikes_station.tolist():
+                bike = BikeStation(self.env, self.graph, self.config, self.fleet)
+                bike.attach_station(station_id)  # saves the station in the bike
+                bike.set_location(self.stations[station_id].location)
+                self.stations[station_id].attach_bike(bike.id)  # saves the bike in the station
+                self.bikes.append(bike)
+        elif self.MODE == 1 or self.MODE == 2:  # TODO: review bike generation
             BikeDockless.reset()
-            for (station_id, station,) in self.stations_data.iterrows():  # TODO: review bike generation
-                for i in range(station["Bikes"]):
-                    bike = BikeDockless(self.env, self.graph, self.config)
-                    location = Location(station["Longitude"], station["Latitude"])
-                    bike.set_location(location)
-                    self.bikes.append(bike)
-        elif self.MODE == 2:
             BikeAutonomous.reset()
-            for (station_id, station,) in self.stations_data.iterrows():  # TODO: review bike generation
-                for i in range(station["Bikes"]):
-                    bike = BikeAutonomous(self.env, self.graph, self.config, self.ui, self.results)
-                    location = Location(station["Longitude"], station["Latitude"])
-                    bike.set_location(location)
-                    self.bikes.append(bike)
+            locations = self.stations_data[["Longitude", "Latitude"]].values[bikes_station]
+            nodes = self.graph.closest_nodes_kdtree(locations)  # snap all the bikes in one query
+            for lon, lat, node in zip(locations[:, 0].tolist(), locations[:, 1].tolist(), nodes.tolist()):
+                if self.MODE == 1:
+                    bike = BikeDockless(self.env, self.graph, self.config, self.fleet)
+                else:
+                    bike = BikeAutonomous(self.env, self.graph, self.config, self.ui, self.results, self.fleet)
+                bike.set_location(Location(lon, lat, node), snap=False)
+                self.bikes.append(bike)
 
     def init_users(self):
-        self.users_data["start_node"] = self.graph.network.get_node_ids(self.users_data["start_lon"], self.users_data["start_lat"])
-        self.users_data["target_node"] = self.graph.network.get_node_ids(self.users_data["target_lon"], self.users_data["target_lat"])
+        self.users_data["start_node"] = self.graph.get_node_ids(self.users_data["start_lon"], self.users_data["start_lat"])
+        self.users_data["target_node"] = self.graph.get_node_ids(self.users_data["target_lon"], self.users_data["target_lat"])
 
         # print("Loading users")
         UserStation.reset()
         UserDockless.reset()
         UserAutonomous.reset()
-        for _, trip in self.users_data.iterrows():
-            origin = Location(trip["start_lon"], trip["start_lat"], trip["start_node"])
-            destination = Location(trip["target_lon"], trip["target_lat"], trip["target_node"])
-            departure_time = trip["start_time"]  # / 60  # departure time
-            target_time = trip["target_time"]  # target time
+        self.users_data["user_id"] = np.arange(len(self.users_data))  # row order, before sorting by departure
+        self.users_data = self.users_data.sort_values("start_time", kind="stable")
+        self.env.process(self.user_arrivals())
+
+    def user_arrivals(self):
+        # creates every user at its departure time, so only the active users live in the event queue
+        # users may be created right at their departure time, their init_user wait is relative to now
+        # ids follow the rows of the trip table, as when every user was created up front
+        columns = ["user_id", "start_lon", "start_lat", "start_node", "target_lon", "target_lat", "target_node", "start_time", "target_time"]
+        trips = zip(*[self.users_data[column].values.tolist() for column in columns])
+        for user_id, start_lon, start_lat, start_node, target_lon, target_lat, target_node, departure_time, target_time in trips:
+            if departure_time > self.env.now:
+                yield self.env.timeout(departure_time - self.env.now)
+
+            origin = Location(start_lon, start_lat, start_node)
+            destination = Location(target_lon, target_lat, target_node)
             if self.MODE == 0:
-                user = UserStation(self.env, self.graph, self.ui, self.config, self.results, origin, destination, departure_time, target_time,)
+                user = UserStation(self.env, self.graph, self.ui, self.config, self.results, origin, destination, departure_time, target_time, user_id)
             elif self.MODE == 1:
-                user = UserDockless(self.env, self.graph, self.ui, self.config, self.results, origin, destination, departure_time, target_time,)
+                user = UserDockless(self.env, self.graph, self.ui, self.config, self.results, origin, destination, departure_time, target_time, user_id)
             elif self.MODE == 2:
-                user = UserAutonomous(self.env, self.graph, self.ui, self.config, self.results, origin, destination, departure_time, target_time,)
-            user.start()
-            self.users.append(user)
+                user = UserAutonomous(self.env, self.graph, self.ui, self.config, self.results, origin, destination, departure_time, target_time, user_id)
+            self.users_active += 1
+            user.start().callbacks.append(self.user_finished)
+        self.users_arrived = True
+        self.check_finished()
+
+    def user_finished(self, event):
+        self.users_active -= 1
+        self.check_finished()
+
+    def check_finished(self, event=None):
+        # demand is exhausted: every user is done and no bike drives or charges on its own any more
+        if self.finished.triggered or not self.users_arrived or self.users_active > 0 or self.ui.bikes_active > 0:
+            return
+        self.end_time = self.env.now
+        if self.rebalancer is not None:
+            self.rebalancer.stop()
+        if self.monitor is not None:
+            self.monitor.stop()
+        self.finished.succeed()
 
     def init_managers(self):
         if self.MODE != 1:
             self.ui.set_stations(self.stations)
-        self.ui.set_bikes(self.bikes)
+        self.ui.set_bikes(self.bikes, self.fleet)
+        self.ui.bike_callbacks.append(self.check_finished)
 
         if self.MODE == 2 and self.REBALANCING_EVERY > 0:
-            self.rebalancer.set_bikes(self.bikes)
+            self.rebalancer.set_bikes(self.bikes, self.fleet)
             self.rebalancer.start()
+
+        if self.PROGRESS_EVERY > 0:
+            self.monitor = ProgressMonitor(self.env, self, self.PROGRESS_EVERY, self.results.path)
+            self.monitor.start()
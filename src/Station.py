@@ -1,5 +1,6 @@
 import random
-import logging
+
+from . import Trace
 
 
 class Station:
@@ -47,10 +48,12 @@ class Station:
         if self.has_docks():
             self.bikes.append(bike_id)
             self.num_bikes += 1
-            logging.info("[%.2f] Station %d number of bikes +1, %d/%d bikes available" % (self.env.now, self.id, self.num_bikes, self.capacity))
+            if Trace.STATION >= Trace.DEBUG:
+                Trace.emit("station_bike_in", self.env.now, self.id, self.num_bikes, self.capacity)
             return True
         else:
-            logging.info("[%.2f] Station %d has no docks available" % (self.env.now, self.id))
+            if Trace.STATION:
+                Trace.emit("station_no_docks", self.env.now, self.id)
             return False
 
     def detach_bike(self, bike_id):  # What happens if no bikes?
@@ -58,8 +61,10 @@ class Station:
             # bike_id=random.choice(self.bikes)
             self.bikes.remove(bike_id)
             self.num_bikes -= 1
-            logging.info("[%.2f] Station %d number of bikes -1, %d/%d bikes available" % (self.env.now, self.id, self.num_bikes, self.capacity))
+            if Trace.STATION >= Trace.DEBUG:
+                Trace.emit("station_bike_out", self.env.now, self.id, self.num_bikes, self.capacity)
             return True
         else:
-            logging.info("[%.2f] Station %d has no bikes available" % (self.env.now, self.id))
+            if Trace.STATION:
+                Trace.emit("station_no_bikes", self.env.now, self.id)
             return False
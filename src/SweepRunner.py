@@ -0,0 +1,102 @@
+import os
+import random
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+from .SimulationEngine import SimulationEngine
+from .RunCache import RunCache
+from preprocessing.BikeGeneration import BikeGeneration
+
+# shared with the workers: set in the parent right before forking, inherited copy-on-write
+SWEEP_STATE = {}
+
+
+class SweepRunner:
+    # runs a grid of configs on a pool of forked workers that share the graph loaded once by the parent
+    # finished runs are recorded in the run manifest with their run cache key, so an interrupted sweep resumes where it stopped
+    def __init__(self, graph, until, processes=None, stations_path=None, cache=None):
+        self.graph = graph
+        self.until = until
+        self.processes = processes or os.cpu_count()
+        self.stations_path = stations_path or os.path.join("data", "bluebikes_stations_07_2020.csv")
+        self.cache = cache or RunCache()
+
+    @staticmethod
+    def users_path(config):
+        return os.path.join("data", "user_trips_" + str(config["USER_TRIPS_FILE"]) + ".csv")
+
+    def run(self, grid):
+        # returns the results directory of every config of the grid, reusing the cached runs
+        keys = []
+        paths = {}
+        tasks = {}
+        for config in grid:
+            seed = RunCache.seed(config)
+            key = self.cache.key(config, [SweepRunner.users_path(config), self.stations_path], seed, until=self.until, graph=self.graph.fingerprint())
+            keys.append(key)
+            path = self.cache.get(key)
+            if path is not None:
+                paths[key] = path
+            elif key not in tasks:
+                tasks[key] = (key, config, seed)
+        tasks = list(tasks.values())
+        print("Sweep: %d configs, %d cached or repeated, %d to run on %d processes" % (len(grid), len(grid) - len(tasks), len(tasks), self.processes))
+        if not tasks:
+            return [paths[key] for key in keys]
+
+        # loaded once here, the workers get them for free when forked
+        self.graph.network  # lazy, built before forking so the workers do not each build their own
+        SWEEP_STATE["graph"] = self.graph
+        SWEEP_STATE["users"] = {path: pd.read_csv(path) for path in set(SweepRunner.users_path(config) for _, config, _ in tasks)}
+        SWEEP_STATE["stations_path"] = self.stations_path
+        SWEEP_STATE["until"] = self.until
+
+        context = multiprocessing.get_context("fork")
+        k = 0
+        with context.Pool(self.processes) as pool:
+            for record in pool.imap_unordered(SweepRunner.run_task, tasks):
+                k += 1
+                if "error" in record:
+                    print("[", k, "/", len(tasks), "]", record["key"][:16], "failed:", record["error"])
+                    continue
+                # lengths routed by the worker, its copy of the cache is gone with it
+                self.graph.path_cache.merge(record.pop("path_cache"))
+                paths[record["key"]] = record["path"]
+                print("[", k, "/", len(tasks), "]", record["key"][:16], "construction:", round(record["construction_time"], 3), "run:", round(record["run_time"], 3), "path cache hit rate:", round(record["path_cache_hit_rate"], 3), record["path"])
+
+        self.graph.save_path_cache()
+        return [paths.get(key) for key in keys]
+
+    @staticmethod
+    def run_task(task):
+        key, config, seed = task
+        try:
+            # forked workers inherit the parent's random state, seed every run instead
+            np.random.seed(seed)
+            random.seed(seed)
+            path_cache = SWEEP_STATE["graph"].path_cache
+            path_cache.track()
+            hits, misses = path_cache.hits, path_cache.misses
+
+            stations_data = BikeGeneration(config["NUM_BIKES"], config["MODE"], SWEEP_STATE["stations_path"])
+            users_data = SWEEP_STATE["users"][SweepRunner.users_path(config)].copy()
+
+            city = SimulationEngine(config, stations_data, users_data, SWEEP_STATE["graph"])
+            city.run(until=SWEEP_STATE["until"])
+            hits, misses = path_cache.hits - hits, path_cache.misses - misses
+            hit_rate = hits / (hits + misses) if hits + misses > 0 else 0.0
+            city.finish(cache_key=key, seed=seed, path_cache_hit_rate=hit_rate)
+        except Exception as e:
+            return {"key": key, "error": repr(e)}
+
+        # the run itself is in the manifest, the parent only needs what it reports
+        return {
+            "key": key,
+            "path": city.results.path,
+            "construction_time": city.construction_time,
+            "run_time": city.run_time,
+            "path_cache_hit_rate": hit_rate,
+            "path_cache": path_cache.added,
+        }
@@ -0,0 +1,123 @@
+import logging
+
+# level gated, structured event tracing
+# call sites check the level of their subsystem before building anything:
+#     if Trace.USER:
+#         Trace.emit("user_walk", self.env.now, self.id, ...)
+# so with tracing off (the default) an event costs a module attribute lookup
+
+OFF = 0
+INFO = 1
+DEBUG = 2
+LEVELS = {"OFF": OFF, "INFO": INFO, "DEBUG": DEBUG}
+
+SUBSYSTEMS = ["USER", "BIKE", "STATION", "INTERFACE", "REBALANCING"]
+
+# current level per subsystem (set by configure)
+USER = OFF
+BIKE = OFF
+STATION = OFF
+INTERFACE = OFF
+REBALANCING = OFF
+
+# event -> (subsystem, level, text format, field names), the time goes first in every event
+EVENTS = {
+    # users
+    "user_init": ("USER", INFO, "User %d initialized at location [%.4f, %.4f]", ["user", "lon", "lat"]),
+    "user_walk": ("USER", INFO, "User %d walked from [%.4f, %.4f] to location [%.4f, %.4f]", ["user", "lon", "lat", "to_lon", "to_lat"]),
+    "user_ride": ("USER", INFO, "User %d biking with bike %d from [%.4f, %.4f] to location [%.4f, %.4f]", ["user", "bike", "lon", "lat", "to_lon", "to_lat"]),
+    "user_no_trip": ("USER", INFO, "User %d will not make the trip", ["user"]),
+    "user_instant_bike": ("USER", INFO, "User %d made a instant bike request", ["user"]),
+    "user_instant_dock": ("USER", INFO, "User %d made a instant dock request", ["user"]),
+    "user_no_walkable_stations": ("USER", INFO, "User %d had no walkable stations", ["user"]),
+    "user_start_station": ("USER", INFO, "User %d selected start station %d", ["user", "station"]),
+    "user_end_station": ("USER", INFO, "User %d selected end station %d", ["user", "station"]),
+    "user_far_end_station": ("USER", INFO, "User %d will end at a station out of walkable distance", ["user"]),
+    "user_no_end_station": ("USER", INFO, "User %d has no end station", ["user"]),
+    "user_dockless_bike": ("USER", INFO, "User %d selected dockless bike %d", ["user", "bike"]),
+    "user_autonomous_bike": ("USER", INFO, "User %d was assigned the autonomous bike %d", ["user", "bike"]),
+    "user_bike_rented": ("USER", INFO, "User %d, bike %d has already been rented. Looking for another one.", ["user", "bike"]),
+    "user_unlock": ("USER", INFO, "User %d unlocked bike %d", ["user", "bike"]),
+    "user_unlock_station": ("USER", INFO, "User %d unlocked bike %d from station %d", ["user", "bike", "station"]),
+    "user_lock": ("USER", INFO, "User %d locked bike %d", ["user", "bike"]),
+    "user_lock_station": ("USER", INFO, "User %d locked bike %d in station %d", ["user", "bike", "station"]),
+    "user_no_bikes_station": ("USER", INFO, "User %d,station %d had zero bikes available at arrival", ["user", "station"]),
+    "user_no_docks_station": ("USER", INFO, "User %d,station %d had zero docks available at arrival", ["user", "station"]),
+    "user_arrived": ("USER", INFO, "User %d arrived to final location [%.4f, %.4f]", ["user", "lon", "lat"]),
+    "user_arrived_destination": ("USER", INFO, "User %d arrived to final destination", ["user"]),
+    # bikes
+    "bike_state": ("BIKE", DEBUG, "Bike %d at [%.4f, %.4f], station %d, battery level %.2f", ["bike", "lon", "lat", "station", "value"]),
+    "bike_drive_start": ("BIKE", INFO, "Bike %d driving autonomously from [%.4f, %.4f] to location [%.4f, %.4f]", ["bike", "lon", "lat", "to_lon", "to_lat"]),
+    "bike_drive_end": ("BIKE", INFO, "Bike %d drove autonomously from [%.4f, %.4f] to location [%.4f, %.4f]", ["bike", "lon", "lat", "to_lon", "to_lat"]),
+    "bike_battery": ("BIKE", DEBUG, "Battery level of bike %d: %.2f", ["bike", "value"]),
+    "bike_needs_charge": ("BIKE", INFO, "Bike %d needs to recharge. Battery level:  %.2f", ["bike", "value"]),
+    "bike_to_charge": ("BIKE", INFO, "Bike %d going to station %d for recharge", ["bike", "station"]),
+    "bike_lock_charging": ("BIKE", INFO, "Bike %d locked in charging station %d", ["bike", "station"]),
+    "bike_no_docks_charging": ("BIKE", INFO, "Bike %d,station %d had zero docks available at arrival", ["bike", "station"]),
+    "bike_unlock_charging": ("BIKE", INFO, "Bike %d unlocked from charging station %d", ["bike", "station"]),
+    "bike_charge_start": ("BIKE", INFO, "Bike %d started recharging", ["bike"]),
+    "bike_charge_end": ("BIKE", INFO, "Bike %d fully charged", ["bike"]),
+    "bike_charged": ("BIKE", INFO, "Bike %d is charged and available again", ["bike"]),
+    # stations
+    "station_bike_in": ("STATION", DEBUG, "Station %d number of bikes +1, %d/%d bikes available", ["station", "value", "capacity"]),
+    "station_bike_out": ("STATION", DEBUG, "Station %d number of bikes -1, %d/%d bikes available", ["station", "value", "capacity"]),
+    "station_no_docks": ("STATION", INFO, "Station %d has no docks available", ["station"]),
+    "station_no_bikes": ("STATION", INFO, "Station %d has no bikes available", ["station"]),
+    "charging_station_full": ("STATION", INFO, "Charging station %d has no spaces available", ["station"]),
+    # data interface (searches that found nothing)
+    "no_walkable_docks": ("INTERFACE", INFO, "No docks in a walkable distance", []),
+    "no_instant_bike_source": ("INTERFACE", INFO, "No stations found as source of instant bike", []),
+    "no_instant_bike_target": ("INTERFACE", INFO, "No stations found as target for instant bike", []),
+    "no_instant_dock_target": ("INTERFACE", INFO, "No stations found as target of instant bike", []),
+    "no_instant_dock_source": ("INTERFACE", INFO, "No stations found as source for instant bike", []),
+    "no_station_docks": ("INTERFACE", INFO, "ERROR: No station with docks -> Think about changing this part of the code", []),
+    "no_walkable_bikes": ("INTERFACE", INFO, "No bikes in walkable distance", []),
+    "no_reachable_bikes": ("INTERFACE", INFO, "No bikes in reachable distance", []),
+    "no_available_bikes": ("INTERFACE", INFO, "No available bikes", []),
+    "no_charging_station": ("INTERFACE", INFO, "No charging stations with available space", []),
+    # managers
+    "demand_check": ("REBALANCING", INFO, "Demand check", []),
+    "rebalancing_bike": ("REBALANCING", INFO, "Rebalancing bike %d", ["bike"]),
+    "battery_check": ("REBALANCING", INFO, "Battery check", []),
+    "rebalancing_stopped": ("REBALANCING", INFO, "Rebalancing stopped", []),
+    "rebalancing_loading": ("REBALANCING", INFO, "Loading Rebalancing", []),
+    "rebalancing_loaded": ("REBALANCING", INFO, "Done Rebalancing", []),
+    "routing_loading": ("REBALANCING", INFO, "Loading Routing", []),
+    "routing_loaded": ("REBALANCING", INFO, "Done Routing", []),
+    "rebalancing_started": ("REBALANCING", INFO, "Rebalancing ongoing", []),
+}
+
+# receivers of the event tuples (event, time, *values)
+sinks = []
+
+
+def configure(levels):
+    # levels: {"ALL": "INFO", "STATION": "DEBUG", ...}, missing subsystems take "ALL" (default OFF)
+    default = LEVELS[levels.get("ALL", "OFF")]
+    for subsystem in SUBSYSTEMS:
+        globals()[subsystem] = LEVELS[levels.get(subsystem, "OFF")] if subsystem in levels else default
+    sinks.clear()
+
+
+def enabled():
+    return any(globals()[subsystem] > OFF for subsystem in SUBSYSTEMS)
+
+
+def emit(event, time, *values):
+    # the subsystem level is checked by the caller, only the event level is left
+    subsystem, level, _, _ = EVENTS[event]
+    if globals()[subsystem] < level:
+        return
+    record = (event, time) + values
+    for sink in sinks:
+        sink(record)
+
+
+def format(record):
+    event, time = record[0], record[1]
+    return "[%.2f] " % time + EVENTS[event][2] % record[2:]
+
+
+def log_sink(record):
+    # text form, as it used to be written in app.log
+    logging.info(format(record))
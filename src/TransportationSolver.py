@@ -0,0 +1,177 @@
+import numpy as np
+
+
+class TransportationSolver:
+    # rebalancing as a transportation problem: bikes of every cell (supply) go to the demand of the cells at the least
+    # total distance, demand that cannot be reached stays unserved (the slacks of the LP), the flows are integral
+    # successive shortest paths on the residual graph, dijkstra with node potentials over the dense cost matrix
+    # warm start: a solve starts from the flows and potentials of the previous one, cut down to the new bikes and demand
+    def __init__(self, cost, k=-1):
+        self.cost = np.asarray(cost, dtype=np.float64)
+        self.n = len(self.cost)
+
+        # arcs: every pair of cells, or the k closest cells of every cell (always including itself)
+        arcs = np.ones((self.n, self.n), dtype=bool)
+        if 0 < k < self.n:
+            nearest = np.argpartition(self.cost, k - 1, axis=1)[:, :k]
+            arcs[:] = False
+            arcs[np.arange(self.n)[:, None], nearest] = True
+            np.fill_diagonal(arcs, True)
+        self.arc_cost = np.where(arcs, self.cost, np.inf)
+        self.eps = 1e-9 * max(1.0, self.cost.max(initial=0))  # labels closer than this are ties (tight arcs are ~0)
+
+        self.flow = None
+        self.potential_supply = np.zeros(self.n)
+        self.potential_demand = np.zeros(self.n)
+
+    @staticmethod
+    def clip(flow, limit):
+        # flows of every row cut down (first arcs first) so the row sums are at most limit
+        before = np.cumsum(flow, axis=1) - flow
+        return np.clip(limit[:, None] - before, 0, flow)
+
+    def warm_start(self, supply, demand):
+        # every cell keeps its own bikes for its own demand: zero cost, optimal with zero potentials
+        cold = np.diag(np.minimum(supply, demand))
+        if self.flow is None:
+            return cold, np.zeros(self.n), np.zeros(self.n)
+
+        # less flow on an arc keeps the reduced costs right (>= 0, and 0 where bikes are sent)
+        flow = TransportationSolver.clip(self.flow, supply)
+        flow = TransportationSolver.clip(flow.T, demand).T.copy()
+        potential_supply = self.potential_supply.copy()
+        potential_demand = self.potential_demand.copy()
+
+        # the arcs from the source and to the sink also need: potentials of the cells with bikes left <= potentials
+        # of the sending cells, potentials of the served cells <= potentials of the cells with demand left,
+        # the flows of the cells that break it are dropped
+        while True:
+            sent = flow.sum(axis=1)
+            received = flow.sum(axis=0)
+            # potentials of the cells without flow only have to keep the reduced costs >= 0, take the best ones:
+            # as high as possible for the demand cells, then as low as possible for the supply cells
+            idle = received == 0
+            potential_demand[idle] = (self.arc_cost[:, idle] + potential_supply[:, None]).min(axis=0)
+            idle = sent == 0
+            potential_supply[idle] = (potential_demand - self.arc_cost[idle]).max(axis=1)
+            drop_supply = np.zeros(self.n, dtype=bool)
+            drop_demand = np.zeros(self.n, dtype=bool)
+            if (sent < supply).any():
+                drop_supply = (sent > 0) & (potential_supply < potential_supply[sent < supply].max() - self.eps)
+            if (received < demand).any():
+                drop_demand = (received > 0) & (potential_demand > potential_demand[received < demand].min() + self.eps)
+            if not drop_supply.any() and not drop_demand.any():
+                break
+            flow[drop_supply, :] = 0
+            flow[:, drop_demand] = 0
+
+        # the previous solution is only worth it while it keeps more bikes placed than the cold start
+        if flow.sum() < cold.sum():
+            return cold, np.zeros(self.n), np.zeros(self.n)
+        return flow, potential_supply, potential_demand
+
+    def solve(self, supply, demand):
+        n = self.n
+        supply = np.asarray(supply, dtype=np.int64)
+        demand = np.asarray(demand, dtype=np.int64)
+
+        # reduced costs cost[i, j] + potential_supply[i] - potential_demand[j] are >= 0 on every arc and 0 where flow > 0
+        flow, potential_supply, potential_demand = self.warm_start(supply, demand)
+        supply_left = supply - flow.sum(axis=1)
+        demand_left = demand - flow.sum(axis=0)
+        received = flow.sum(axis=0)  # bikes sent to every demand cell
+
+        while supply_left.any() and demand_left.any():
+            sources = np.flatnonzero(supply_left > 0)
+            potential_source = potential_supply[sources].max()
+            potential_sink = potential_demand[demand_left > 0].min()
+
+            # labels of the cells with bikes left and of every demand cell reached from them in one step
+            distance_supply = np.full(n, np.inf)
+            distance_supply[sources] = potential_source - potential_supply[sources]
+            previous_supply = np.full(n, -1)  # demand cell it is reached from (backward arc), -1 from the source
+            reduced = distance_supply[sources, None] + self.arc_cost[sources] + potential_supply[sources, None] - potential_demand
+            best = reduced.argmin(axis=0)
+            distance_demand = reduced[best, np.arange(n)]
+            previous_demand = sources[best]
+
+            # dijkstra over the demand cells that lead somewhere (demand left or bikes to send back),
+            # supply cells are relaxed as soon as a backward arc improves them
+            useful = (demand_left > 0) | (received > 0)
+            open_demand = np.where(useful, distance_demand, np.inf)
+            done_demand = np.zeros(n, dtype=bool)
+            distance_sink = np.inf
+            last = -1
+            while True:
+                j = open_demand.argmin()
+                if open_demand[j] >= distance_sink:
+                    break
+                open_demand[j] = np.inf
+                done_demand[j] = True
+                if demand_left[j] > 0 and distance_demand[j] + potential_demand[j] - potential_sink < distance_sink:
+                    distance_sink = distance_demand[j] + potential_demand[j] - potential_sink
+                    last = j
+
+                # backward arcs j -> the cells that send bikes to j, then their forward arcs
+                back = np.flatnonzero(flow[:, j] > 0)
+                distance = distance_demand[j] - self.cost[back, j] + potential_demand[j] - potential_supply[back]
+                better = distance < distance_supply[back] - self.eps
+                for i, label in zip(back[better].tolist(), distance[better].tolist()):
+                    distance_supply[i] = label
+                    previous_supply[i] = j
+                    distance = label + self.arc_cost[i] + potential_supply[i] - potential_demand
+                    improved = (distance < distance_demand - self.eps) & ~done_demand
+                    distance_demand[improved] = distance[improved]
+                    previous_demand[improved] = i
+                    open_demand[improved & useful] = distance[improved & useful]
+
+            if last < 0:
+                break  # no reachable demand left
+
+            # every demand cell of the tree as close to the sink as the last one ends a shortest path
+            ends = done_demand & (demand_left > 0) & (distance_demand + potential_demand - potential_sink <= distance_sink + self.eps)
+            ends[last] = False
+            ends = [last] + np.flatnonzero(ends).tolist()
+
+            potential_supply += np.minimum(distance_supply, distance_sink)
+            potential_demand += np.minimum(distance_demand, distance_sink)
+
+            # the arcs of the shortest paths have zero reduced cost now, all of them can be augmented in turn
+            for last in ends:
+                self.augment(flow, received, supply_left, demand_left, previous_supply, previous_demand, last)
+
+        # only differences of potentials matter, keep them from drifting over the periods
+        shift = min(potential_supply.min(), potential_demand.min())
+        self.flow = flow.copy()
+        self.potential_supply = potential_supply - shift
+        self.potential_demand = potential_demand - shift
+        return flow
+
+    @staticmethod
+    def augment(flow, received, supply_left, demand_left, previous_supply, previous_demand, last):
+        # path back from the sink: forward arcs (i, j) and backward arcs (i, j) whose flow is reduced
+        forward = []
+        backward = []
+        amount = demand_left[last]
+        j = last
+        while True:
+            i = previous_demand[j]
+            forward.append((i, j))
+            if previous_supply[i] < 0:
+                break
+            j = previous_supply[i]
+            backward.append((i, j))
+            amount = min(amount, flow[i, j])
+        first = i
+        amount = min(amount, supply_left[first])
+        if amount <= 0:
+            return  # an earlier path of the same tree used it up
+
+        for i, j in forward:
+            flow[i, j] += amount
+            received[j] += amount
+        for i, j in backward:
+            flow[i, j] -= amount
+            received[j] -= amount
+        supply_left[first] -= amount
+        demand_left[last] -= amount
@@ -0,0 +1,133 @@
+import os
+import gzip
+
+import numpy as np
+
+from . import Profiler
+
+FORMATS = ["csv", "csv.gz", "parquet"]
+
+# what a buffered field holds: its typed value, nothing ("" in the csv), None, or a value the column type cannot hold
+VALUE, UNSET, NONE, OTHER = 0, 1, 2, 3
+
+
+class TripSink:
+    # trip records buffered in preallocated typed columns (int64 / float64 arrays) and written in batches
+    # csv batches are formatted column by column (str() of the python values, as the records hold them), parquet keeps the types
+    # with an AsyncWriter (io) the batches are formatted and written on its thread
+    def __init__(self, path, name, header, dtypes, format="csv", batch_size=65536, io=None):
+        if format not in FORMATS:
+            raise ValueError("Unknown results format: %s" % format)
+
+        self.header = header
+        self.dtypes = [dtypes[column] for column in header]  # int64 / float64 / string (parquet schema)
+        self.format = format
+        self.batch_size = batch_size
+        self.file = os.path.join(path, name + "." + format)
+        self.io = io
+
+        self.types = [{"int64": int, "float64": float, "string": str}[dtype] for dtype in self.dtypes]  # python type of the values
+        self.values = [np.empty(batch_size, dtype=object if dtype == "string" else dtype) for dtype in self.dtypes]
+        # filled through memoryviews, a python int or float is stored without a numpy scalar on the way
+        self.slots = [values if dtype == "string" else memoryview(values) for dtype, values in zip(self.dtypes, self.values)]
+        self.kinds = [bytearray(batch_size) for _ in header]  # VALUE (0) / UNSET / NONE / OTHER per field, only set when not VALUE
+        self.others = {}  # (column, row) -> value that does not fit the column type, written with str()
+        self.n = 0
+        self.rows = 0
+
+        if format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            self.pa = pa
+            types = {"int64": pa.int64(), "float64": pa.float64(), "string": pa.string()}
+            self.schema = pa.schema([(column, types[dtypes[column]]) for column in header])
+            self.out = pq.ParquetWriter(self.file, self.schema)
+        else:
+            if format == "csv.gz":
+                self.out = gzip.open(self.file, "wt")
+            else:
+                self.out = open(self.file, "w")
+            self.out.write(",".join(header) + "\n")
+
+    @Profiler.phase("trip_write")
+    def add(self, store):
+        n = self.n
+        for column, (type_, slots, kinds, value) in enumerate(zip(self.types, self.slots, self.kinds, store.values())):
+            if type(value) is type_:  # "" in a string column is a value that reads as unset
+                slots[n] = value
+            elif value is None:
+                kinds[n] = NONE
+            elif value == "" and isinstance(value, str):
+                kinds[n] = UNSET
+            else:
+                self.others[column, n] = value
+                kinds[n] = OTHER
+        self.n = n + 1
+        if self.n == self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.n == 0:
+            return
+        # copies, the buffers can be refilled right away
+        batch = ([values[: self.n].copy() for values in self.values], [np.frombuffer(kinds[: self.n], dtype=np.uint8) for kinds in self.kinds], self.others)
+        self.others = {}
+        for kinds in self.kinds:
+            kinds[: self.n] = bytes(self.n)
+        if self.io is None:
+            self.write(*batch)
+        else:
+            self.io.submit(self.write, *batch)
+        self.rows += self.n
+        self.n = 0
+
+    def write(self, columns, kinds, others):
+        if self.format == "parquet":
+            arrays = [self.array(column, values, kinds[column], others) for column, values in enumerate(columns)]
+            self.out.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+            return
+
+        columns = [TripSink.text(column, values, kinds[column], others) for column, values in enumerate(columns)]
+        self.out.write("".join(",".join(row) + "\n" for row in zip(*columns)))
+
+    @staticmethod
+    def text(column, values, kinds, others):
+        # csv fields of a column, as str() of the value the trip record held
+        if not kinds.any():  # all values, the common case
+            return list(map(str, values.tolist()))
+        if (kinds == UNSET).all():
+            return [""] * len(kinds)
+        text = np.array(list(map(str, values.tolist())), dtype=object)
+        text[kinds == UNSET] = ""
+        text[kinds == NONE] = "None"
+        for (other_column, row), value in others.items():
+            if other_column == column:
+                text[row] = str(value)
+        return text.tolist()
+
+    def array(self, column, values, kinds, others):
+        # unset fields ("" or None) become nulls, values that do not fit the column type are cast when they can be
+        if self.dtypes[column] == "string":
+            strings = [value if kind == VALUE and value != "" else None for value, kind in zip(values.tolist(), kinds.tolist())]
+            for (other_column, row), value in others.items():
+                if other_column == column:
+                    strings[row] = str(value)
+            return self.pa.array(strings, self.pa.string())
+        valid = kinds == VALUE
+        for (other_column, row), value in others.items():
+            if other_column == column:
+                try:
+                    values[row] = value
+                    valid[row] = True
+                except (TypeError, ValueError):
+                    pass
+        return self.pa.array(values, mask=~valid)
+
+    @Profiler.phase("trip_write")
+    def close(self):
+        self.flush()
+        if self.io is None:
+            self.out.close()
+        else:
+            self.io.submit(self.out.close)
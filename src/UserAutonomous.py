@@ -1,17 +1,16 @@
-
 import numpy as np
-import logging
 from .UserTrip import UserTrip
 from .Location import Location
+from . import Trace
 
 class UserAutonomous:
     id_count = -1
 
     def __init__(
-        self, env, graph, ui, config, results, origin, destination, departure_time, target_time,
+        self, env, graph, ui, config, results, origin, destination, departure_time, target_time, user_id=None,
     ):
         self.next_id()
-        self.id = UserAutonomous.id_count
+        self.id = UserAutonomous.id_count if user_id is None else user_id
 
         self.env = env
         self.graph = graph
@@ -46,13 +45,13 @@ class UserAutonomous:
         distance = self.dist(self.location, location)
         time = distance / self.WALKING_SPEED
         yield self.env.timeout(time)
-        logging.info("[%.2f] User %d walked from [%.4f, %.4f] to location [%.4f, %.4f]" % (self.env.now, self.id, self.location.lon, self.location.lat, location.lon, location.lat,))
+        if Trace.USER:
+            Trace.emit("user_walk", self.env.now, self.id, self.location.lon, self.location.lat, location.lon, location.lat)
         self.location = location
 
     def ride_bike_to(self, location):
-        logging.info(
-            "[%.2f] User %d biking with bike %d from [%.4f, %.4f] to location [%.4f, %.4f]" % (self.env.now, self.id, self.bike_id, self.location.lon, self.location.lat, location.lon, location.lat,)
-        )
+        if Trace.USER:
+            Trace.emit("user_ride", self.env.now, self.id, self.bike_id, self.location.lon, self.location.lat, location.lon, location.lat)
         yield self.env.process(self.ui.bike_ride(self.bike_id, location))
         self.location = location
 
@@ -60,13 +59,14 @@ class UserAutonomous:
         return self.graph.get_shortest_path_length(a, b)
 
     def start(self):
-        self.env.process(self.process())
+        return self.env.process(self.process())
 
     def init_user(self):
         # waits until its the hour to initialize user
-        yield self.env.timeout(self.departure_time)
+        yield self.env.timeout(max(0, self.departure_time - self.env.now))
         self.location = self.origin
-        logging.info("[%.2f] User %d initialized at location [%.4f, %.4f]" % (self.env.now, self.id, self.location.lon, self.location.lat))
+        if Trace.USER:
+            Trace.emit("user_init", self.env.now, self.id, self.location.lon, self.location.lat)
 
     def process(self):
         # 0-Setup
@@ -84,11 +84,13 @@ class UserAutonomous:
                 self.bike_id, bike_location = self.call_autonomous_instant_bike(self.location)
 
         if self.bike_id is None:
-            logging.info("[%.2f] User %d will not make the trip" % (self.env.now, self.id))
+            if Trace.USER:
+                Trace.emit("user_no_trip", self.env.now, self.id)
             self.save_user_trip()
             return
 
-        logging.info("[%.2f] User %d was assigned the autonomous bike %d" % (self.env.now, self.id, self.bike_id))
+        if Trace.USER:
+            Trace.emit("user_autonomous_bike", self.env.now, self.id, self.bike_id)
 
         # 3-Wait for autonomous bike
         yield self.env.process(self.autonomous_drive(self.instant_bike))
@@ -105,7 +107,8 @@ class UserAutonomous:
 
         # 6-Finish
         # TODO: estimate travel from building to nearest node
-        logging.info("[%.2f] User %d arrived to final destination" % (self.env.now, self.id))
+        if Trace.USER:
+            Trace.emit("user_arrived_destination", self.env.now, self.id)
 
         self.time_ride = self.env.now - self.time_wait - self.departure_time
         # 7-Charge bike if low battery
@@ -129,12 +132,14 @@ class UserAutonomous:
     def unlock_bike(self):
         self.ui.bike_unlock(self.bike_id, self.id)
         yield self.env.timeout(1)
-        logging.info("[%.2f] User %d unlocked bike %d" % (self.env.now, self.id, self.bike_id))
+        if Trace.USER:
+            Trace.emit("user_unlock", self.env.now, self.id, self.bike_id)
 
     def lock_bike(self):
         yield self.env.timeout(1)
         self.ui.bike_lock(self.bike_id)
-        logging.info("[%.2f] User %d locked bike %d" % (self.env.now, self.id, self.bike_id))
+        if Trace.USER:
+            Trace.emit("user_lock", self.env.now, self.id, self.bike_id)
 
     def save_user_trip(self):
         self.user_trip.set("user_id", self.id)
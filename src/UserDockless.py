@@ -1,16 +1,16 @@
-import logging
 from .UserTrip import UserTrip
 from .Location import Location
+from . import Trace
 
 
 class UserDockless:
     id_count = -1
 
     def __init__(
-        self, env, graph, ui, config, results, origin, destination, departure_time, target_time,
+        self, env, graph, ui, config, results, origin, destination, departure_time, target_time, user_id=None,
     ):
         self.next_id()
-        self.id = UserDockless.id_count
+        self.id = UserDockless.id_count if user_id is None else user_id
 
         self.env = env
         self.graph = graph
@@ -43,13 +43,13 @@ class UserDockless:
         distance = self.dist(self.location, location)
         time = distance / self.WALKING_SPEED
         yield self.env.timeout(time)
-        logging.info("[%.2f] User %d walked from [%.4f, %.4f] to location [%.4f, %.4f]" % (self.env.now, self.id, self.location.lon, self.location.lat, location.lon, location.lat,))
+        if Trace.USER:
+            Trace.emit("user_walk", self.env.now, self.id, self.location.lon, self.location.lat, location.lon, location.lat)
         self.location = location
 
     def ride_bike_to(self, location):
-        logging.info(
-            "[%.2f] User %d biking with bike %d from [%.4f, %.4f] to location [%.4f, %.4f]" % (self.env.now, self.id, self.bike_id, self.location.lon, self.location.lat, location.lon, location.lat,)
-        )
+        if Trace.USER:
+            Trace.emit("user_ride", self.env.now, self.id, self.bike_id, self.location.lon, self.location.lat, location.lon, location.lat)
         yield self.env.process(self.ui.bike_ride(self.bike_id, location))
         self.location = location
 
@@ -57,13 +57,14 @@ class UserDockless:
         return self.graph.shortest_path_length(a, b)
 
     def start(self):
-        self.env.process(self.process())
+        return self.env.process(self.process())
 
     def init_user(self):
         # waits until its the hour to initialize user
-        yield self.env.timeout(self.departure_time)
+        yield self.env.timeout(max(0, self.departure_time - self.env.now))
         self.location = self.origin
-        logging.info("[%.2f] User %d initialized at location [%.4f, %.4f]" % (self.env.now, self.id, self.location.lon, self.location.lat))
+        if Trace.USER:
+            Trace.emit("user_init", self.env.now, self.id, self.location.lon, self.location.lat)
 
     def process(self):
         # 0-Setup
@@ -78,10 +79,12 @@ class UserDockless:
             self.bike_id, bike_location = self.select_dockless_bike(self.location)
 
             if self.bike_id is None:
-                logging.info("[%.2f] User %d  will not make the trip" % (self.env.now, self.id))
+                if Trace.USER:
+                    Trace.emit("user_no_trip", self.env.now, self.id)
                 return self.save_user_trip()
 
-            logging.info("[%.2f] User %d selected dockless bike %d" % (self.env.now, self.id, self.bike_id))
+            if Trace.USER:
+                Trace.emit("user_dockless_bike", self.env.now, self.id, self.bike_id)
 
             # 3-Walk to dockless bike
             yield self.env.process(self.walk_to(bike_location))
@@ -100,7 +103,8 @@ class UserDockless:
 
         # 7-Finish
         # yield self.env.timeout(0)
-        logging.info("[%.2f] User %d arrived to final location [%.4f, %.4f]" % (self.env.now, self.id, self.location.lon, self.location.lat))
+        if Trace.USER:
+            Trace.emit("user_arrived", self.env.now, self.id, self.location.lon, self.location.lat)
 
         self.time_ride = self.env.now - self.time_walk_origin - self.departure_time
         # 8-Save Trip
@@ -113,17 +117,20 @@ class UserDockless:
         if not self.ui.bike_get_busy(self.bike_id):
             yield self.env.timeout(1)
             self.ui.bike_unlock(self.bike_id, self.id)
-            logging.info("[%.2f] User %d unlocked bike %d" % (self.env.now, self.id, self.bike_id))
+            if Trace.USER:
+                Trace.emit("user_unlock", self.env.now, self.id, self.bike_id)
             self.event_unlock_bike.succeed()
         else:
             yield self.env.timeout(1)
-            logging.info("[%.2f] User %d, bike %d has already been rented. Looking for another one." % (self.env.now, self.id, self.bike_id))
+            if Trace.USER:
+                Trace.emit("user_bike_rented", self.env.now, self.id, self.bike_id)
             # self.bike_id = None
 
     def lock_bike(self):
         yield self.env.timeout(1)
         self.ui.bike_lock(self.bike_id)
-        logging.info("[%.2f] User %d locked bike %d" % (self.env.now, self.id, self.bike_id))
+        if Trace.USER:
+            Trace.emit("user_lock", self.env.now, self.id, self.bike_id)
 
     def save_user_trip(self):
         self.user_trip.set("user_id", self.id)
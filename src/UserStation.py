@@ -1,17 +1,17 @@
 import numpy as np
-import logging
 from .UserTrip import UserTrip
 from .BikeTrip import BikeTrip
+from . import Trace
 
 
 class UserStation:
     id_count = -1
 
     def __init__(
-        self, env, graph, ui, config, results, origin, destination, departure_time, target_time,
+        self, env, graph, ui, config, results, origin, destination, departure_time, target_time, user_id=None,
     ):
         self.next_id()
-        self.id = UserStation.id_count
+        self.id = UserStation.id_count if user_id is None else user_id
         self.env = env
         self.graph = graph
         self.ui = ui
@@ -55,13 +55,13 @@ class UserStation:
         distance = self.dist(self.location, location)
         time = distance / self.WALKING_SPEED
         yield self.env.timeout(time)
-        logging.info("[%.2f] User %d walked from [%.4f, %.4f] to location [%.4f, %.4f]" % (self.env.now, self.id, self.location.lon, self.location.lat, location.lon, location.lat,))
+        if Trace.USER:
+            Trace.emit("user_walk", self.env.now, self.id, self.location.lon, self.location.lat, location.lon, location.lat)
         self.location = location
 
     def ride_bike_to(self, location):
-        logging.info(
-            "[%.2f] User %d biking with bike %d from [%.4f, %.4f] to location [%.4f, %.4f]" % (self.env.now, self.id, self.bike_id, self.location.lon, self.location.lat, location.lon, location.lat,)
-        )
+        if Trace.USER:
+            Trace.emit("user_ride", self.env.now, self.id, self.bike_id, self.location.lon, self.location.lat, location.lon, location.lat)
         yield self.env.process(self.ui.bike_ride(self.bike_id, location))
         self.location = location
 
@@ -69,13 +69,14 @@ class UserStation:
         return self.graph.shortest_path_length(a, b)
 
     def start(self):
-        self.env.process(self.process())
+        return self.env.process(self.process())
 
     def init_user(self):
-        yield self.env.timeout(self.departure_time)
+        yield self.env.timeout(max(0, self.departure_time - self.env.now))
         self.location = self.origin
         # print("[%.2f] User %d  departure time: %.4f " % (self.env.now, self.id,self.departure_time ))
-        logging.info("[%.2f] User %d initialized at location [%.4f, %.4f]" % (self.env.now, self.id, self.location.lon, self.location.lat))
+        if Trace.USER:
+            Trace.emit("user_init", self.env.now, self.id, self.location.lon, self.location.lat)
 
     def process(self):
         visited_stations = []
@@ -87,10 +88,12 @@ class UserStation:
                 if any_walkable:
                     rand_number = np.random.randint(100)
                     if rand_number <= self.INSTANT_BETA:
-                        logging.info("[%.2f] User %d  made a instant bike request" % (self.env.now, self.id))
+                        if Trace.USER:
+                            Trace.emit("user_instant_bike", self.env.now, self.id)
                         (station_id, station_location, visited_stations, self.instant_bike_id, self.instant_origin_station,) = self.ui.instant_bike(self.location, visited_stations)
                     if station_id is None:
-                        logging.info("[%.2f] User %d  will not make the trip" % (self.env.now, self.id))
+                        if Trace.USER:
+                            Trace.emit("user_no_trip", self.env.now, self.id)
                         self.status = "no_bikes"
                         return self.save_user_trip()
                     self.instant_bike += 1
@@ -98,11 +101,13 @@ class UserStation:
                     self.instant_destination_station = station_id
                     self.save_bike_trip(instant_bike=True, instant_dock=False)
                 else:
-                    logging.info("[%.2f] User %d had no walkable stations" % (self.env.now, self.id))  # TODO: review
-                    logging.info("[%.2f] User %d  will not make the trip" % (self.env.now, self.id))
+                    if Trace.USER:
+                        Trace.emit("user_no_walkable_stations", self.env.now, self.id)  # TODO: review
+                        Trace.emit("user_no_trip", self.env.now, self.id)
                     self.status = "not_walkable_stations"
                     return self.save_user_trip()
-            logging.info("[%.2f] User %d selected start station %d" % (self.env.now, self.id, station_id))
+            if Trace.USER:
+                Trace.emit("user_start_station", self.env.now, self.id, station_id)
             yield self.env.process(self.walk_to(station_location))
             yield self.env.process(self.unlock_bike(station_id))
             # if not self.event_interact_bike.triggered:
@@ -123,7 +128,8 @@ class UserStation:
             if station_id is None:
                 rand_number = np.random.randint(100)
                 if rand_number <= self.INSTANT_BETA:
-                    logging.info("[%.2f] User %d  made a instant dock request" % (self.env.now, self.id))
+                    if Trace.USER:
+                        Trace.emit("user_instant_dock", self.env.now, self.id)
                     (station_id, station_location, visited_stations, self.instant_bike_id, self.instant_origin_station,) = self.ui.instant_dock(self.destination, visited_stations)
                 if station_id is not None:
                     # self.instant_bike = 0
@@ -131,13 +137,16 @@ class UserStation:
                     self.instant_destination_station = station_id
                     self.save_bike_trip(instant_bike=False, instant_dock=True)
                 else:
-                    logging.info("[%.2f] User %d  will end at a station out of walkable distance" % (self.env.now, self.id))
+                    if Trace.USER:
+                        Trace.emit("user_far_end_station", self.env.now, self.id)
                     (station_id, station_location, visited_stations,) = self.ui.notwalkable_dock(self.destination, visited_stations)
                     if station_id is None:
-                        logging.info("[%.2f] User %d has no end station" % (self.env.now, self.id))
+                        if Trace.USER:
+                            Trace.emit("user_no_end_station", self.env.now, self.id)
                         self.status = "no_end_station"
                         return self.save_user_trip()
-            logging.info("[%.2f] User %d selected end station %d" % (self.env.now, self.id, station_id))
+            if Trace.USER:
+                Trace.emit("user_end_station", self.env.now, self.id, station_id)
             yield self.env.process(self.ride_bike_to(station_location))
             yield self.env.process(self.lock_bike(station_id))
             # if station_id is not None and not self.event_interact_bike.triggered:
@@ -152,7 +161,8 @@ class UserStation:
         self.time_walk_destination = self.env.now - self.time_ride - self.time_walk_origin - self.departure_time
         # print("[%.2f] User %d destination walk time: %.4f =%.4f - %.4f - %.4f -%.4f" % (self.env.now, self.id,self.time_walk_destination, self.env.now, self.time_ride,self.time_ride, self.departure_time))
         # yield self.env.timeout(10)
-        logging.info("[%.2f] User %d arrived to final location [%.4f, %.4f]" % (self.env.now, self.id, self.location.lon, self.location.lat))
+        if Trace.USER:
+            Trace.emit("user_arrived", self.env.now, self.id, self.location.lon, self.location.lat)
         self.destination_station = station_id
         self.destination_visited_stations = ";".join(map(str, visited_stations))
         self.status = "finished"
@@ -169,20 +179,24 @@ class UserStation:
             self.bike_id = self.ui.station_choose_bike(station_id)
             self.ui.bike_register_unlock(self.bike_id, self.id)
             self.ui.station_detach_bike(station_id, self.bike_id)
-            logging.info("[%.2f] User %d unlocked bike %d from station %d" % (self.env.now, self.id, self.bike_id, station_id))
+            if Trace.USER:
+                Trace.emit("user_unlock_station", self.env.now, self.id, self.bike_id, station_id)
             self.event_interact_bike.succeed()
         else:
-            logging.info("[%.2f] User %d,station %d had zero bikes available at arrival" % (self.env.now, self.id, station_id))
+            if Trace.USER:
+                Trace.emit("user_no_bikes_station", self.env.now, self.id, station_id)
         yield self.env.timeout(1)
 
     def lock_bike(self, station_id):
         if self.ui.station_has_docks(station_id):
             self.ui.station_attach_bike(station_id, self.bike_id)
             self.ui.bike_register_lock(self.bike_id, self.id)
-            logging.info("[%.2f] User %d locked bike %d in station %d" % (self.env.now, self.id, self.bike_id, station_id))
+            if Trace.USER:
+                Trace.emit("user_lock_station", self.env.now, self.id, self.bike_id, station_id)
             self.event_interact_bike.succeed()
         else:
-            logging.info("[%.2f] User %d,station %d had zero docks available at arrival" % (self.env.now, self.id, station_id))
+            if Trace.USER:
+                Trace.emit("user_no_docks_station", self.env.now, self.id, station_id)
         yield self.env.timeout(1)
 
     def interact_bike(self, action):
@@ -191,20 +205,24 @@ class UserStation:
                 self.bike_id = self.ui.station_choose_bike(self.origin_station)
                 self.ui.bike_register_unlock(self.bike_id, self.id)
                 self.ui.station_detach_bike(self.origin_station, self.bike_id)
-                logging.info("[%.2f] User %d unlocked bike %d from station %d" % (self.env.now, self.id, self.bike_id, self.origin_station))
+                if Trace.USER:
+                    Trace.emit("user_unlock_station", self.env.now, self.id, self.bike_id, self.origin_station)
                 self.event_interact_bike.succeed()
             else:
-                logging.info("[%.2f] User %d,station %d had zero bikes available at arrival" % (self.env.now, self.id, self.origin_station))
+                if Trace.USER:
+                    Trace.emit("user_no_bikes_station", self.env.now, self.id, self.origin_station)
         else:
             if action == "lock":
                 if self.ui.station_has_docks(self.destination_station):
                     self.ui.station_attach_bike(self.destination_station, self.bike_id)
                     self.ui.bike_register_lock(self.bike_id, self.id)
-                    logging.info("[%.2f] User %d locked bike %d in station %d" % (self.env.now, self.id, self.bike_id, self.destination_station,))
+                    if Trace.USER:
+                        Trace.emit("user_lock_station", self.env.now, self.id, self.bike_id, self.destination_station)
                     self.bike_id = None
                     self.event_interact_bike.succeed()
                 else:
-                    logging.info("[%.2f] User %d,station %d had zero docks available at arrival" % (self.env.now, self.id, self.destination_station))
+                    if Trace.USER:
+                        Trace.emit("user_no_docks_station", self.env.now, self.id, self.destination_station)
             yield self.env.timeout(1)
 
     def save_user_trip(self):
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class UserTrip:
     id_count = -1
     header = [
@@ -24,6 +27,10 @@ class UserTrip:
         "bike_lon",
         "bike_lat",
     ]
+    # column types of the typed (parquet) results
+    dtypes = dict.fromkeys(header, "int64")
+    dtypes.update(dict.fromkeys(["origin_lon", "origin_lat", "destination_lon", "destination_lat", "bike_lon", "bike_lat"], "float64"))
+    dtypes.update(dict.fromkeys(["status", "origin_visited_stations", "destination_visited_stations"], "string"))
 
     def __init__(self):
         self.store = dict.fromkeys(UserTrip.header, "")
@@ -37,17 +44,16 @@ class UserTrip:
 
     def set(self, key, value, digits=2):
         if key in self.store.keys():
+            # typed values, formatted (if at all) when the results are written
+            if isinstance(value, np.generic):
+                value = value.item()  # numpy scalars print and sum like python ones only after this
             if isinstance(value, bool):
                 value = int(value)
-                value = str(value)
-            elif isinstance(value, int):
-                value = str(value)
             elif isinstance(value, float):
                 if digits == 0:
                     value = int(value)
                 else:
                     value = round(value, digits)
-                value = str(value)
             self.store[key] = value
         else:
             raise BaseException
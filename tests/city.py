@@ -0,0 +1,122 @@
+import os
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+NAME = "test_city"
+
+
+def equirect(lon_a, lat_a, lon_b, lat_b):
+    R = 6378137.0
+    lon_a, lat_a, lon_b, lat_b = np.radians([lon_a, lat_a, lon_b, lat_b])
+    x = (lon_b - lon_a) * np.cos(0.5 * (lat_b + lat_a))
+    y = lat_b - lat_a
+    return R * np.sqrt(x * x + y * y)
+
+
+def graph(rows=20, cols=20, seed=0):
+    # street grid around Cambridge with a few missing blocks and jittered intersections
+    rng = np.random.RandomState(seed)
+    lon = np.linspace(-71.11, -71.07, cols)
+    lat = np.linspace(42.355, 42.375, rows)
+    G = nx.Graph()
+    for i in range(rows):
+        for j in range(cols):
+            x = lon[j] + rng.uniform(-1e-4, 1e-4)
+            y = lat[i] + rng.uniform(-1e-4, 1e-4)
+            G.add_node("n%d" % (i * cols + j), x=float(x), y=float(y))
+    for i in range(rows):
+        for j in range(cols):
+            u = i * cols + j
+            for v in ([u + 1] if j + 1 < cols else []) + ([u + cols] if i + 1 < rows else []):
+                if rng.uniform() < 0.1:
+                    continue
+                a, b = G.nodes["n%d" % u], G.nodes["n%d" % v]
+                G.add_edge("n%d" % u, "n%d" % v, length=float(equirect(a["x"], a["y"], b["x"], b["y"])))
+    return G
+
+
+def stations(n=15, seed=1):
+    # already in the form BikeGeneration returns: docks and the bikes parked at each station
+    # coordinates are not rounded, rounded ones end in ties that numpy and python round differently (see test_golden)
+    rng = np.random.RandomState(seed)
+    docks = rng.randint(4, 12, n)
+    return pd.DataFrame({
+        "Number": ["T%d" % i for i in range(n)],
+        "Name": ["Station %d" % i for i in range(n)],
+        "Latitude": rng.uniform(42.356, 42.374, n),
+        "Longitude": rng.uniform(-71.109, -71.071, n),
+        "District": "Cambridge",
+        "Public": "Yes",
+        "Docks": docks,
+        "Bikes": (docks * rng.uniform(0.3, 0.8, n)).astype(int),
+    })
+
+
+def users(n=250, seed=2):
+    # trips in two hours, not sorted by start time (as the trip tables are not), coordinates unrounded as in stations()
+    rng = np.random.RandomState(seed)
+    start_time = rng.uniform(0, 7200, n).round(0)
+    return pd.DataFrame({
+        "start_lon": rng.uniform(-71.109, -71.071, n),
+        "start_lat": rng.uniform(42.356, 42.374, n),
+        "target_lon": rng.uniform(-71.109, -71.071, n),
+        "target_lat": rng.uniform(42.356, 42.374, n),
+        "start_time": start_time,
+        "target_time": start_time + rng.uniform(600, 2400, n).round(0),
+    })
+
+
+def demand_grid(cols=4, rows=4):
+    # rebalancing demand: the start of every trip of users() in the cell of a cols x rows lattice that contains it
+    trips = users()
+    lon = np.linspace(-71.11, -71.07, cols + 1)
+    lat = np.linspace(42.355, 42.375, rows + 1)
+    i = np.searchsorted(lon, trips.start_lon.values) - 1
+    j = np.searchsorted(lat, trips.start_lat.values) - 1
+    demand = pd.DataFrame({
+        "ts": pd.to_datetime(trips.start_time, unit="s").astype(str),
+        "unix": trips.start_time.astype(int),
+        "lon": trips.start_lon,
+        "lat": trips.start_lat,
+        "group_lon": ((lon[i] + lon[i + 1]) / 2).round(4),
+        "group_lat": ((lat[j] + lat[j + 1]) / 2).round(4),
+        "lon_lb": lon[i],
+        "lon_ub": lon[i + 1],
+        "lat_lb": lat[j],
+        "lat_ub": lat[j + 1],
+    }, index=pd.Index(trips.start_time.values, name="time"))
+    return demand.sort_index(kind="stable")
+
+
+def write(path):
+    # data/graph/<NAME>.graphml, data/user_trips_0.csv, data/stations.csv, data/demand_grid.csv and an empty results/ under path
+    os.makedirs(os.path.join(path, "data", "graph"), exist_ok=True)
+    os.makedirs(os.path.join(path, "results"), exist_ok=True)
+    nx.write_graphml(graph(), os.path.join(path, "data", "graph", NAME + ".graphml"))
+    users().to_csv(os.path.join(path, "data", "user_trips_0.csv"), index=False)
+    stations().to_csv(os.path.join(path, "data", "stations.csv"), index=False)
+    demand_grid().to_csv(os.path.join(path, "data", "demand_grid.csv"))
+
+
+def config(mode):
+    return {
+        "MODE": mode,
+        "NUM_BIKES": 60,
+        "WALK_RADIUS": 600,
+        "AUTONOMOUS_RADIUS": 1500,
+        "RIDING_SPEED": 10.2,
+        "WALKING_SPEED": 5,
+        "AUTONOMOUS_SPEED": 8,
+        "BATTERY_MIN_LEVEL": 15,
+        "BATTERY_AUTONOMY": 70,
+        "BATTERY_CHARGE_TIME": 4.5,
+        "INSTANT_BETA": 90,
+        "INSTANT_MIN_BIKES": 3,
+        "INSTANT_MIN_DOCKS": 3,
+        "REBALANCING_EVERY": -1,
+        "REBALANCING_AHEAD": 0,
+        "REBALANCING_WINDOW": 30,
+        "USER_TRIPS_FILE": 0,
+    }
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import city
+
+
+@pytest.fixture
+def city_dir(tmp_path, monkeypatch):
+    # the simulation reads data/ and writes results/ relative to the working directory
+    city.write(str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
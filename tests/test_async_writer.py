@@ -0,0 +1,71 @@
+import os
+import threading
+
+import pytest
+
+from src import Trace
+from src.AsyncWriter import AsyncWriter
+from src.TripSink import TripSink
+
+from test_simulation import simulate
+
+
+@pytest.fixture
+def trace():
+    yield
+    Trace.configure({})
+
+
+def read(path, name):
+    with open(os.path.join(path, name), "rb") as f:
+        return f.read()
+
+
+def test_async_output_matches_sync(city_dir, trace):
+    config = dict(REBALANCING_EVERY=15, TRACE={"ALL": "DEBUG"}, TRACE_FORMAT="both", RESULTS_BATCH=16)
+    sync = simulate(2, **config)
+    sync.finish()
+    threaded = simulate(2, RESULTS_ASYNC=True, RESULTS_QUEUE=2, **config)
+    threaded.finish()
+
+    for name in ["user_trips.csv", "bike_trips.csv", "app.log", "events.bin"]:
+        expected = read(sync.results.path, name)
+        assert len(expected) > 0
+        assert read(threaded.results.path, name) == expected
+
+
+def test_full_queue_blocks():
+    writer = AsyncWriter(max_pending=2)
+    release = threading.Event()
+    written = []
+    writer.submit(release.wait)  # holds the i/o thread
+    writer.submit(written.append, 0)
+    writer.submit(written.append, 1)
+
+    # the queue is full, the next submit waits for room instead of dropping the job
+    blocked = threading.Thread(target=writer.submit, args=(written.append, 2))
+    blocked.start()
+    blocked.join(timeout=0.2)
+    assert blocked.is_alive()
+
+    release.set()
+    blocked.join()
+    writer.close()
+    assert written == [0, 1, 2]
+
+
+def test_error_on_the_io_thread_reaches_close():
+    writer = AsyncWriter()
+    writer.submit(lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        writer.close()
+
+
+def test_error_on_the_io_thread_reaches_finish(city_dir, monkeypatch):
+    def write(self, *batch):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(TripSink, "write", write)
+    sim = simulate(1, RESULTS_ASYNC=True)
+    with pytest.raises(OSError, match="disk full"):
+        sim.finish()
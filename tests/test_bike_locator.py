@@ -0,0 +1,37 @@
+import numpy as np
+
+from src.BikeLocator import BikeLocator
+
+
+def brute_force(locations, lon, lat, k, available, max_dist=np.inf):
+    distances = np.hypot(locations[:, 0] - lon, locations[:, 1] - lat)
+    candidates = [i for i in np.argsort(distances, kind="stable") if available(i) and distances[i] <= max_dist]
+    return np.array(candidates[:k], dtype=int)
+
+
+def test_nearest_matches_brute_force():
+    rng = np.random.RandomState(0)
+    locations = np.column_stack([rng.uniform(-71.11, -71.07, 300), rng.uniform(42.35, 42.38, 300)])
+    locator = BikeLocator(locations)
+    busy = set(rng.choice(300, 60, replace=False).tolist())
+    available = lambda bike_id: bike_id not in busy
+
+    for lon, lat in zip(rng.uniform(-71.12, -71.06, 30), rng.uniform(42.34, 42.39, 30)):
+        for k, max_dist in [(1, np.inf), (5, np.inf), (10, 0.004)]:
+            bikes_id, distances = locator.nearest(lon, lat, k, available, max_dist)
+            np.testing.assert_array_equal(bikes_id, brute_force(locations, lon, lat, k, available, max_dist))
+            assert np.all(np.diff(distances) >= 0)
+
+
+def test_moved_bikes_are_found_at_their_new_location():
+    locator = BikeLocator([[-71.10, 42.36], [-71.08, 42.37]])
+    locator.move(0, -71.0801, 42.3701)
+    bikes_id, _ = locator.nearest(-71.08, 42.37, 2, lambda bike_id: True)
+    np.testing.assert_array_equal(bikes_id, [1, 0])
+    assert locator.nearest(-71.10, 42.36, 1, lambda bike_id: True, max_dist=0.01)[0].size == 0
+
+
+def test_degrees_bounds_the_radius():
+    # 1 km at Boston's latitude is about 0.012 degrees of longitude
+    assert 0.012 < BikeLocator.degrees(1000, 42.36) < 0.013
+    assert BikeLocator.degrees(np.inf, 42.36) == np.inf
@@ -0,0 +1,59 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from src.Graph import Graph
+from src.RebalancingManager import Routing
+
+import city
+
+
+def rebalancing_grid():
+    # as RebalancingManager builds it from data/demand_grid.csv
+    demand = city.demand_grid()
+    return demand.drop_duplicates(["group_lon", "group_lat"]).reset_index().drop(columns=["ts", "unix", "lon", "lat"])
+
+
+def cells_files(graph):
+    return glob.glob(os.path.join(graph.path, graph.name + "_cells_*.npy"))
+
+
+def test_distances_are_routed_and_cached(city_dir, monkeypatch):
+    graph = Graph(city.NAME)
+    routing = Routing(rebalancing_grid(), graph)
+    nodes = routing.grid.node.values
+    for i in [0, 3, 7]:
+        for j in range(len(nodes)):
+            a, b = routing.grid.location[i], routing.grid.location[j]
+            expected = 0 if i == j else graph.shortest_path_length(a, b) / 1000
+            assert routing.dist[i, j] == pytest.approx(expected, abs=1e-4)  # pandana rounds to mm
+    assert len(cells_files(graph)) == 1
+
+    # a second engine loads the matrix from disk
+    def route(*args):
+        raise AssertionError("routed again")
+
+    monkeypatch.setattr(graph, "distance_matrix", route)
+    np.testing.assert_array_equal(Routing(rebalancing_grid(), graph).dist, routing.dist)
+
+
+def test_key_covers_the_nodes_and_the_graph(city_dir):
+    graph = Graph(city.NAME)
+    grid = rebalancing_grid()
+    bounds = grid[["lon_lb", "lon_ub", "lat_lb", "lat_ub"]].values
+    nodes = graph.get_node_ids(grid.lon_lb.values, grid.lat_lb.values)
+    distances = graph.precompute_cells_distances(bounds, nodes)
+
+    # same cells, snapped to other nodes
+    moved = graph.get_node_ids(grid.lon_ub.values, grid.lat_ub.values)
+    np.testing.assert_array_equal(graph.precompute_cells_distances(bounds, moved), graph.distance_matrix(moved, moved))
+    assert len(cells_files(graph)) == 2
+
+    # same name and cells, another graph
+    rebuilt = Graph(city.NAME)
+    rebuilt.lengths = rebuilt.lengths * 2
+    rebuilt.create_csgraph()
+    np.testing.assert_allclose(rebuilt.precompute_cells_distances(bounds, nodes), 2 * distances)
+    assert len(cells_files(graph)) == 3
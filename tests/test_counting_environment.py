@@ -0,0 +1,41 @@
+import simpy
+import pytest
+
+from src.CountingEnvironment import CountingEnvironment
+
+
+def test_pending_events_follow_the_simpy_queue():
+    env = CountingEnvironment()
+
+    def walker(delay):
+        for _ in range(3):
+            yield env.timeout(delay)
+
+    for delay in [1, 2, 5]:
+        env.process(walker(delay))
+    assert env.events_pending == len(env._queue) == 3
+
+    while True:
+        try:
+            env.step()
+        except simpy.core.EmptySchedule:
+            break
+        assert env.events_pending == len(env._queue)
+    assert env.events_pending == 0
+    assert env.events_processed == env.events_scheduled == 3 * 5  # start, 3 timeouts and the end of each walker
+
+
+def test_pending_events_after_a_stop():
+    env = CountingEnvironment()
+
+    def parked():
+        yield env.timeout(10)
+
+    env.process(parked())
+    env.run(until=5)
+    assert env.events_pending == len(env._queue)
+    env.run()
+    assert env.events_pending == 0
+    with pytest.raises(simpy.core.EmptySchedule):
+        env.step()
+    assert env.events_pending == 0
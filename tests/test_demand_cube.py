@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from src.DemandCube import DemandCube
+
+import city
+
+
+def load():
+    # as RebalancingManager reads and groups data/demand_grid.csv
+    demand = city.demand_grid()
+    grid = demand.drop_duplicates(["group_lon", "group_lat"]).reset_index().drop(columns=["ts", "unix", "lon", "lat"])
+    return demand, grid
+
+
+def groupby_window(demand, grid, start, stop):
+    # the per period slice and groupby DemandCube replaced, its sorted cells put back in grid order
+    subset = demand.loc[start:stop]
+    subset = pd.concat([subset, grid], axis=0, join="outer", ignore_index=True, sort=False)
+    counts = subset.groupby(["group_lon", "group_lat"]).size() - 1
+    return counts.loc[list(zip(grid.group_lon, grid.group_lat))].values
+
+
+def test_windows_match_the_groupby():
+    demand, grid = load()
+    cube = DemandCube(demand, grid)
+    for start in np.arange(-900, 7800, 450):
+        for length in [0, 900, 2700]:
+            np.testing.assert_array_equal(cube.window(start, start + length), groupby_window(demand, grid, start, start + length))
+
+
+def test_cells_follow_the_grid_order():
+    # the k-th count is the demand of grid.iloc[k], the cell the k-th bike count and LP row are about
+    demand, grid = load()
+    assert list(zip(grid.group_lon, grid.group_lat)) != sorted(zip(grid.group_lon, grid.group_lat))
+    window = DemandCube(demand, grid).window(1800, 5400)
+    subset = demand.loc[1800:5400]
+    for k, cell in grid.iterrows():
+        assert window[k] == ((subset.group_lon == cell.group_lon) & (subset.group_lat == cell.group_lat)).sum()
+
+
+def test_window_bounds_are_inclusive():
+    demand, grid = load()
+    cube = DemandCube(demand, grid)
+    t = demand.index.values[10]
+    assert cube.window(t, t).sum() == (demand.index.values == t).sum() > 0
+    assert cube.window(-10, demand.index.max()).sum() == len(demand)
+    assert cube.window(demand.index.max() + 1, demand.index.max() + 100).sum() == 0
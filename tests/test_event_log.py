@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pytest
+
+from src import Trace
+from src.EventLog import EventLog
+
+from test_simulation import simulate
+
+
+@pytest.fixture
+def trace():
+    yield
+    Trace.configure({})
+
+
+def test_records_and_decode(tmp_path):
+    file = str(tmp_path / "events.bin")
+    log = EventLog(file, buffer_size=2)
+    log(("user_unlock_station", 10.5, 3, 7, 2))
+    log(("bike_drive_start", 20.0, 7, -71.1, 42.36, -71.09, 42.37))  # the destination is kept
+    log(("station_bike_in", 21.0, 2, 5, 10))
+    log(("demand_check", 30.0))
+    log.close()
+
+    records, names = EventLog.read(file)
+    assert names == list(Trace.EVENTS)
+    assert len(records) == 4
+    assert list(records["time"]) == [10.5, 20.0, 21.0, 30.0]
+    assert list(records["agent"]) == [3, -1, -1, -1]
+    assert list(records["bike"]) == [7, 7, -1, -1]
+    assert list(records["station"]) == [2, -1, 2, -1]
+    assert (records["lon"][1], records["lat"][1]) == (-71.09, 42.37)
+    assert records["value"][2] == 5 and np.isnan(records["value"][0])
+
+    data = EventLog.decode(file)
+    assert list(data["event"]) == ["user_unlock_station", "bike_drive_start", "station_bike_in", "demand_check"]
+
+
+def test_replay(tmp_path):
+    file = str(tmp_path / "events.bin")
+    log = EventLog(file)
+    log(("bike_state", 0.0, 0, -71.1, 42.36, 4, 80.0))
+    log(("bike_state", 0.0, 1, -71.08, 42.37, 5, 60.0))
+    log(("user_unlock_station", 100.0, 9, 0, 4))
+    log(("user_ride", 100.0, 9, 0, -71.1, 42.36, -71.09, 42.365))
+    log(("user_lock_station", 400.0, 9, 0, 6))
+    log(("bike_battery", 400.0, 0, 75.0))
+    log.close()
+
+    states = dict(EventLog.replay(file, [50.0, 200.0, 500.0]))
+    assert list(states[50.0]["station"]) == [4, 5]
+    assert list(states[200.0]["station"]) == [-1, 5] and list(states[200.0]["user"]) == [9, -1]
+    assert list(states[500.0]["station"]) == [6, 5] and list(states[500.0]["user"]) == [-1, -1]
+    assert (states[500.0]["lon"][0], states[500.0]["lat"][0]) == (-71.09, 42.365)
+    assert states[500.0]["battery"][0] == 75.0
+
+
+def test_binary_log_matches_the_text_log(city_dir, trace):
+    sim = simulate(1, TRACE={"ALL": "DEBUG"}, TRACE_FORMAT="both")
+    sim.finish()
+    with open(os.path.join(sim.results.path, "app.log")) as f:
+        lines = f.read().splitlines()
+    records, names = EventLog.read(os.path.join(sim.results.path, "events.bin"))
+
+    assert len(records) == len(lines) > 0
+    first = EventLog.decode(os.path.join(sim.results.path, "events.bin")).iloc[0]
+    assert lines[0].startswith("[%.2f] " % first["time"])
+
+
+def test_rebalancing_is_traced(city_dir, trace):
+    sim = simulate(2, REBALANCING_EVERY=15, TRACE={"REBALANCING": "INFO"}, TRACE_FORMAT="binary")
+    sim.finish()
+    events = list(EventLog.decode(os.path.join(sim.results.path, "events.bin"))["event"])
+    assert events[:6] == ["rebalancing_loading", "routing_loading", "routing_loaded", "rebalancing_loaded", "rebalancing_started", "demand_check"]
+    assert events[-1] == "rebalancing_stopped"
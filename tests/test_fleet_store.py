@@ -0,0 +1,37 @@
+import numpy as np
+
+from src.FleetStore import FleetStore
+from src.Location import Location
+
+
+def test_register_grows_and_keeps_state():
+    fleet = FleetStore(2)
+    fleet.register(0)
+    fleet.set_location(0, Location(-71.1, 42.36, 7))
+    fleet.busy[0] = True
+    for bike_id in range(1, 5):
+        fleet.register(bike_id)
+
+    assert fleet.size == 5
+    assert len(fleet.busy) >= 5
+    np.testing.assert_array_equal(fleet.locations()[0], [-71.1, 42.36, 7])
+    assert fleet.busy[0] and not fleet.busy[1:5].any()
+    assert (fleet.station_id[:5] == -1).all() and (fleet.user_id[:5] == -1).all()
+
+
+def test_location_without_node():
+    fleet = FleetStore(1)
+    fleet.register(0)
+    fleet.set_location(0, Location(-71.1, 42.36))
+    assert fleet.node[0] == -1
+
+
+def test_available_mask():
+    fleet = FleetStore(3)
+    for bike_id in range(3):
+        fleet.register(bike_id)
+    fleet.busy[1] = True
+    fleet.battery[:3] = [50, 80, 10]
+
+    np.testing.assert_array_equal(fleet.available(), [True, False, True])
+    np.testing.assert_array_equal(fleet.available(battery_min_level=15), [True, False, False])
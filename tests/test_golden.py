@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+from test_simulation import simulate
+
+GOLDEN = os.path.join(os.path.dirname(__file__), "golden")
+
+# tests/golden/mode_<MODE> holds the user and bike trips of a run on city.py's data with the seeds of simulate().
+# mode_0 was written by the code before the trip records were buffered (commit eff1c63), and the current code
+# still writes it byte for byte. mode_1 and mode_2 were written after BikeLocator replaced the kd-tree: the
+# candidate bikes at the same distance come in bike id order now, not in kd-tree order, so users that look for
+# a bike at the same time pick (and collide on) other bikes. Against eff1c63, MODE 1 serves 230 users instead
+# of 220 with a mean walk of 398.1 s instead of 377.6 s, MODE 2 has the same KPIs with other bikes.
+# Regenerate a mode only when a change to its results is intended, and say so in the commit.
+
+
+def read(path, name):
+    with open(os.path.join(path, name)) as f:
+        return f.read().splitlines()
+
+
+@pytest.mark.parametrize("mode", [0, 1, 2])
+def test_run_matches_the_golden_results(city_dir, mode):
+    sim = simulate(mode)
+    sim.finish()
+    for name in ["user_trips.csv", "bike_trips.csv"]:
+        assert read(sim.results.path, name) == read(os.path.join(GOLDEN, "mode_%d" % mode), name), name
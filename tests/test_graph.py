@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from src.Graph import Graph
+from src.Location import Location
+
+import city
+
+
+def test_store_round_trip(city_dir):
+    graph = Graph(city.NAME)
+    graph.save()
+    loaded = Graph.load(city.NAME)
+
+    for key in ["nodes", "indptr", "indices", "lengths"]:
+        assert isinstance(getattr(loaded, key), np.memmap)
+        np.testing.assert_array_equal(getattr(loaded, key), getattr(graph, key))
+    assert loaded.G.number_of_edges() == graph.G.number_of_edges()
+
+
+def test_load_does_not_build_network(city_dir):
+    Graph(city.NAME).save()
+
+    graph = Graph.load(city.NAME)
+    # the arrays are mapped from the store, read only, and nothing is built from them yet
+    for key in ["nodes", "indptr", "indices", "lengths"]:
+        array = getattr(graph, key)
+        assert isinstance(array, np.memmap)
+        assert not array.flags.writeable
+    assert graph._G is None
+    assert graph._network is None
+
+    # snapping points to nodes does not need pandana either
+    lon, lat = graph.nodes[:50, 0] + 1e-5, graph.nodes[:50, 1] - 1e-5
+    nodes = graph.get_node_ids(lon, lat)
+    assert graph._network is None
+    np.testing.assert_array_equal(nodes, np.arange(50))
+
+    # the first pandana query builds it, the same nodes as pandana's own lookup
+    a, b = Location(lon[0], lat[0], 0), Location(lon[40], lat[40], 40)
+    assert graph.shortest_path_length(a, b) > 0
+    assert graph._network is not None
+    np.testing.assert_array_equal(graph.network.get_node_ids(lon, lat).values, nodes)
+
+    # so does the networkx graph, on first access
+    assert graph._G is None
+    assert graph.G.number_of_nodes() == len(graph.nodes)
+    assert graph._G is not None
+
+
+def test_distance_matrix_matches_pandana(city_dir):
+    graph = Graph(city.NAME)
+    nodes = np.array([0, 7, 7, 150, 399])
+    matrix = graph.distance_matrix(nodes, nodes[:3])
+    expected = graph.router.many_to_many(nodes, nodes[:3])
+    np.testing.assert_allclose(matrix, expected, atol=0.1)  # pandana keeps edge lengths to the millimetre
+
+
+def test_only_the_pandana_router(city_dir):
+    graph = Graph(city.NAME)
+    assert graph.router_name == "pandana"
+    with pytest.raises(ValueError):
+        graph.set_router("ch")
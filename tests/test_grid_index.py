@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from src.GridIndex import GridIndex
+
+import city
+
+
+def rebalancing_grid(demand):
+    # as RebalancingManager builds it from the demand table
+    return demand.drop_duplicates(["group_lon", "group_lat"]).reset_index().drop(columns=["ts", "unix", "lon", "lat"])
+
+
+def first_cell(grid, lon, lat):
+    # the bikes x cells mask GridIndex replaced
+    cond = (lon[:, None] > grid.lon_lb.values) & (lon[:, None] < grid.lon_ub.values) & (lat[:, None] > grid.lat_lb.values) & (lat[:, None] < grid.lat_ub.values)
+    return np.where(cond.any(axis=1), grid.index.values[cond.argmax(axis=1)], -1)
+
+
+def points(grid, n, seed):
+    rng = np.random.RandomState(seed)
+    lon = rng.uniform(grid.lon_lb.min() - 0.005, grid.lon_ub.max() + 0.005, n)
+    lat = rng.uniform(grid.lat_lb.min() - 0.005, grid.lat_ub.max() + 0.005, n)
+    # and points right on the cell bounds, which belong to no cell
+    lon[:20] = rng.choice(grid.lon_lb.values, 20)
+    lat[20:40] = rng.choice(grid.lat_ub.values, 20)
+    return lon, lat
+
+
+def test_lookup_matches_the_mask():
+    grid = rebalancing_grid(city.demand_grid())
+    index = GridIndex(grid)
+    lon, lat = points(grid, 2000, 0)
+    cells = index.lookup(lon, lat)
+    np.testing.assert_array_equal(cells, first_cell(grid, lon, lat))
+    assert (cells == -1).any() and (cells >= 0).any()
+    np.testing.assert_array_equal(index.count(cells), np.bincount(cells[cells >= 0], minlength=len(grid)))
+
+
+def test_overlapping_bounds_and_missing_cells():
+    # 5 x 4 lattice with a few cells left out, the bounds rounded outwards so that neighbours overlap
+    rng = np.random.RandomState(1)
+    lon = np.linspace(-71.11, -71.07, 6)
+    lat = np.linspace(42.355, 42.375, 5)
+    cells = [(i, j) for i in range(5) for j in range(4) if rng.uniform() > 0.2]
+    rng.shuffle(cells)
+    grid = pd.DataFrame({
+        "group_lon": [(lon[i] + lon[i + 1]) / 2 for i, _ in cells],
+        "group_lat": [(lat[j] + lat[j + 1]) / 2 for _, j in cells],
+        "lon_lb": [lon[i] - 1e-4 for i, _ in cells],
+        "lon_ub": [lon[i + 1] + 1e-4 for i, _ in cells],
+        "lat_lb": [lat[j] - 1e-4 for _, j in cells],
+        "lat_ub": [lat[j + 1] + 1e-4 for _, j in cells],
+    })
+    index = GridIndex(grid)
+    lon, lat = points(grid, 5000, 2)
+    lon[40:40 + len(grid)] = grid.lon_ub.values - 5e-5  # inside the overlaps
+    np.testing.assert_array_equal(index.lookup(lon, lat), first_cell(grid, lon, lat))
+
+
+def test_empty_batch():
+    index = GridIndex(rebalancing_grid(city.demand_grid()))
+    cells = index.lookup([], [])
+    assert len(cells) == 0
+    assert index.count(cells).sum() == 0
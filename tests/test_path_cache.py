@@ -0,0 +1,73 @@
+import pytest
+
+from src.PathCache import PathCache
+
+
+def test_symmetric_keys_and_stats():
+    cache = PathCache(size=10)
+    assert cache.get(1, 2) is None
+    cache.put(2, 1, 5.0)
+    assert cache.get(1, 2) == 5.0
+    assert cache.get(2, 1) == 5.0
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+    assert cache.hit_rate() == pytest.approx(2 / 3)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = PathCache(size=2, policy="lru")
+    cache.put(0, 1, 1.0)
+    cache.put(0, 2, 2.0)
+    cache.get(0, 1)
+    cache.put(0, 3, 3.0)
+    assert cache.get(0, 2) is None
+    assert cache.get(0, 1) == 1.0
+
+
+def test_fifo_evicts_oldest_insertion():
+    cache = PathCache(size=2, policy="fifo")
+    cache.put(0, 1, 1.0)
+    cache.put(0, 2, 2.0)
+    cache.get(0, 1)
+    cache.put(0, 3, 3.0)
+    assert cache.get(0, 1) is None
+    assert cache.get(0, 2) == 2.0
+
+
+def test_zero_size_stores_nothing():
+    cache = PathCache(size=0)
+    cache.put(0, 1, 1.0)
+    assert cache.get(0, 1) is None
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        PathCache(policy="random")
+
+
+def test_save_and_load(tmp_path):
+    file = str(tmp_path / "paths.npz")
+    cache = PathCache(size=10, file=file)
+    for i in range(5):
+        cache.put(i, i + 1, float(i))
+    cache.save()
+
+    # a smaller cache keeps the most recent entries
+    loaded = PathCache(size=3, file=file)
+    loaded.load()
+    assert len(loaded.store) == 3
+    assert loaded.get(0, 1) is None
+    assert loaded.get(4, 5) == 4.0
+
+
+def test_track_and_merge():
+    worker = PathCache(size=10)
+    worker.put(0, 1, 1.0)
+    worker.track()
+    worker.put(3, 2, 2.0)
+    assert worker.added == [(3, 2, 2.0)]
+
+    parent = PathCache(size=10)
+    parent.merge(worker.added)
+    assert parent.get(2, 3) == 2.0
+    assert parent.get(0, 1) is None
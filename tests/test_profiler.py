@@ -0,0 +1,50 @@
+import json
+import os
+import sys
+
+import pytest
+
+from src import Profiler
+from src.RebalancingManager import Routing
+from src.TripSink import TripSink
+
+from test_simulation import simulate
+
+
+@pytest.fixture
+def profiler():
+    yield
+    Profiler.configure(False)
+
+
+def owner(function):
+    return getattr(sys.modules[function.__module__], function.__qualname__.split(".")[0])
+
+
+def test_profile_counts_the_tagged_phases(city_dir, profiler):
+    sim = simulate(2, REBALANCING_EVERY=15, PROFILE=True)
+    sim.finish()
+    with open(os.path.join(sim.results.path, "profile.json")) as f:
+        profile = json.load(f)
+
+    for phase in ["rebalancing_lp", "trip_write", "routing", "event_dispatch"]:
+        assert profile["phases"][phase]["calls"] > 0
+    assert profile["functions"]["Routing.optimize"]["calls"] > 0
+    assert profile["stats"]["events"] == sim.env.events_processed
+
+
+def test_functions_are_untouched_without_profile(city_dir, profiler):
+    assert len(Profiler.tagged) > 0
+    originals = [(owner(function), function) for function in Profiler.tagged]
+
+    # a profiled run swaps in the timed wrappers, the next run without it puts the originals back
+    simulate(2, REBALANCING_EVERY=15, PROFILE=True).finish()
+    assert Routing.optimize is not Profiler.wrapped[(Routing, "optimize")]
+    sim = simulate(2, REBALANCING_EVERY=15)
+    sim.finish()
+
+    assert not Profiler.enabled()
+    for cls, function in originals:
+        assert cls.__dict__[function.__name__] is function
+    assert TripSink.__dict__["add"].profile_phase == "trip_write"
+    assert not os.path.exists(os.path.join(sim.results.path, "profile.json"))
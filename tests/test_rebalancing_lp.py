@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from src.Graph import Graph
+from src.RebalancingManager import Routing
+
+import city
+from test_cells_distances import rebalancing_grid
+
+
+def dense_A(n):
+    # the dense construction get_A replaced
+    A = np.zeros((2*n, n**2 + n))
+    for i in range(n):
+        for j in range(n):
+            A[i, i*n + j] = 1
+            A[n+i, j*n + i] = -1
+        A[n+i, n**2 + i] = -1
+    return A
+
+
+@pytest.mark.parametrize("n", [1, 2, 5, 13])
+def test_sparse_constraints_match_the_dense_ones(n):
+    routing = Routing.__new__(Routing)
+    routing.n = n
+    A = routing.get_A()
+    assert A.shape == (2*n, n**2 + n)
+    np.testing.assert_array_equal(A.toarray(), dense_A(n))
+
+
+def test_lp_solver(city_dir):
+    graph = Graph(city.NAME)
+    lp = Routing(rebalancing_grid(), graph, solver="lp")
+    transport = Routing(rebalancing_grid(), graph, solver="transport")
+    n = lp.n
+    rng = np.random.RandomState(0)
+    bikes = rng.poisson(2, n)
+    demand = rng.poisson(2, n)
+
+    s = lp.optimize(demand, bikes)
+    assert s.shape == (n, n)
+    assert (s >= 0).all() and (np.diag(s) == 0).all()
+    assert (s.sum(axis=1) <= bikes).all()
+    assert (s.sum(axis=0) <= demand).all()
+
+    # as much demand served as the transportation solver, over the same distance
+    expected = transport.optimize(demand, bikes)
+    assert s.sum() == expected.sum()
+    assert (s * lp.dist).sum() == pytest.approx((expected * transport.dist).sum())
@@ -0,0 +1,57 @@
+import os
+import sqlite3
+
+from src.RunCache import RunCache
+
+
+def test_canonical_config():
+    assert RunCache.canonical({"b": 5.0, "a": [1, 2.0]}) == RunCache.canonical({"a": [1, 2], "b": 5})
+    assert RunCache.seed({"a": 1}) == RunCache.seed({"a": 1.0})
+    assert RunCache.seed({"a": 1}) != RunCache.seed({"a": 2})
+
+
+def test_key_follows_input_content(tmp_path):
+    cache = RunCache(str(tmp_path / "runs.sqlite"))
+    data = tmp_path / "users.csv"
+    data.write_text("a,b\n1,2\n")
+    key = cache.key({"MODE": 0}, [str(data)], 1, until=100)
+    assert key == cache.key({"MODE": 0.0}, [str(data)], 1, until=100)
+    assert key != cache.key({"MODE": 0}, [str(data)], 2, until=100)
+    assert key != cache.key({"MODE": 0}, [str(data)], 1, until=200)
+
+    data.write_text("a,b\n1,3\n")
+    os.utime(str(data), ns=(1, 1))  # new content, whatever the clock resolution
+    assert key != cache.key({"MODE": 0}, [str(data)], 1, until=100)
+
+
+def test_get_reads_the_manifest(tmp_path):
+    file = str(tmp_path / "runs.sqlite")
+    cache = RunCache(file)
+    assert cache.get("abc") is None
+
+    with sqlite3.connect(file) as db:
+        db.execute('CREATE TABLE runs ("run_id" TEXT PRIMARY KEY, "path", "started")')
+    db.close()
+    assert cache.get("abc") is None  # no run recorded a key yet
+
+    old, new = tmp_path / "old", tmp_path / "new"
+    old.mkdir()
+    new.mkdir()
+    with sqlite3.connect(file) as db:
+        db.execute('ALTER TABLE runs ADD COLUMN "cache_key"')
+        db.execute("INSERT INTO runs VALUES ('1', ?, 1.0, 'abc')", (str(old),))
+        db.execute("INSERT INTO runs VALUES ('2', ?, 2.0, 'abc')", (str(new),))
+    db.close()
+    assert cache.get("abc") == str(new)
+
+    new.rmdir()
+    assert cache.get("abc") is None  # results of the latest run are gone
+
+
+def test_reporting_keys_do_not_change_the_key(tmp_path):
+    cache = RunCache(str(tmp_path / "runs.sqlite"))
+    config = {"MODE": 0, "NUM_BIKES": 100}
+    reported = dict(config, TRACE={"ALL": "INFO"}, TRACE_FORMAT="binary", PROFILE=True, PROGRESS_EVERY=30, RESULTS_FORMAT="csv.gz", RESULTS_BATCH=16, RESULTS_ASYNC=True, RESULTS_QUEUE=2)
+    assert RunCache.seed(reported) == RunCache.seed(config)
+    assert cache.key(reported, [], RunCache.seed(reported)) == cache.key(config, [], RunCache.seed(config))
+    assert cache.key(dict(config, NUM_BIKES=101), [], 1) != cache.key(config, [], 1)
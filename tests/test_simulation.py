@@ -0,0 +1,58 @@
+import os
+import random
+
+import numpy as np
+import pandas as pd
+
+from src.Graph import Graph
+from src.SimulationEngine import SimulationEngine
+
+import city
+
+
+def simulate(mode, graph=None, **config):
+    np.random.seed(0)
+    random.seed(0)
+    settings = city.config(mode)
+    settings.update(config)
+    sim = SimulationEngine(settings, city.stations(), pd.read_csv(os.path.join("data", "user_trips_0.csv")), graph or Graph(city.NAME))
+    sim.run(until=20000)
+    return sim
+
+
+def test_user_ids_follow_the_trip_table(city_dir):
+    sim = simulate(1)
+    sim.finish()
+    trips = pd.read_csv(os.path.join(sim.results.path, "user_trips.csv")).sort_values("user_id")
+    users = city.users()
+
+    np.testing.assert_array_equal(trips.user_id, np.arange(len(users)))
+    np.testing.assert_allclose(trips.origin_lon, users.start_lon, atol=1e-5)
+    np.testing.assert_allclose(trips.time_departure, users.start_time, atol=1)
+
+
+def test_run_can_be_continued(city_dir):
+    sim = simulate(1, PROGRESS_EVERY=30)
+    # the demand is exhausted before 20000 s, a second call continues from there
+    end = sim.env.now
+    sim.run(until=end + 3600)
+    assert sim.env.now == end + 3600
+    assert not sim.results.closed
+
+    sim.finish()
+    assert sim.results.closed
+    trips = pd.read_csv(os.path.join(sim.results.path, "user_trips.csv"))
+    assert len(trips) == len(city.users())
+
+
+def test_run_ends_after_the_last_bike_process(city_dir):
+    # rebalancing drives and charges of low batteries outlive the users that caused them
+    sim = simulate(2, REBALANCING_EVERY=15, BATTERY_AUTONOMY=30, BATTERY_MIN_LEVEL=40)
+    assert sim.end_time is not None and sim.env.now == sim.end_time
+    assert sim.ui.bikes_active == 0
+    assert not sim.rebalancer.process.is_alive
+    sim.finish()
+
+    trips = pd.read_csv(os.path.join(sim.results.path, "bike_trips.csv"))
+    assert set(trips.trip_type) >= {1, 2, 3}  # drives to users, charges, rebalancing
+    assert sim.end_time >= (trips.time_departure + trips.time_ride + trips.time_charge.fillna(0)).max()
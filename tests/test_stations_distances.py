@@ -0,0 +1,52 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from src.Graph import Graph
+from src.Location import Location
+from src.SimulationEngine import SimulationEngine
+
+import city
+
+
+def test_matrix_belongs_to_the_simulation(city_dir):
+    graph = Graph(city.NAME)
+
+    station_based = SimulationEngine(city.config(0), city.stations(), city.users(), graph)
+    distances = station_based.ui.stations_distances
+    assert distances.dtype == np.float32
+    assert distances.shape == (len(station_based.stations), len(station_based.stations))
+
+    # a dockless run on the same graph does not see the matrix of the station based one
+    dockless = SimulationEngine(city.config(1), city.stations(), city.users(), graph)
+    assert dockless.ui.stations_distances is None
+    assert not hasattr(graph, "stations_distances")
+
+    # lookups are the routed distances, and the cached matrix is read back unchanged
+    a, b = station_based.stations[0].location, station_based.stations[5].location
+    assert station_based.ui.dist(a, b) == pytest.approx(graph.distance_matrix([a.node], [b.node])[0, 0], abs=1e-3)
+    nodes = station_based.stations_data["Node"].values
+    np.testing.assert_array_equal(graph.stations_distance_matrix(nodes), distances)
+
+    # anything that is not between two stations is routed
+    c = Location(a.lon, a.lat, (a.node + 1) % len(graph.nodes))
+    assert station_based.ui.dist(c, b) == graph.shortest_path_length(c, b)
+
+    station_based.finish()
+    dockless.finish()
+
+
+def test_cache_is_keyed_by_the_graph(city_dir):
+    graph = Graph(city.NAME)
+    nodes = graph.get_node_ids(city.stations().Longitude.values, city.stations().Latitude.values)
+    distances = graph.stations_distance_matrix(nodes)
+    assert os.path.basename(glob.glob(os.path.join(graph.path, graph.name + "_stations_*.npy"))[0]).endswith("_float32.npy")
+
+    # same name and stations, another graph
+    rebuilt = Graph(city.NAME)
+    rebuilt.lengths = rebuilt.lengths * 2
+    rebuilt.create_csgraph()
+    np.testing.assert_allclose(rebuilt.stations_distance_matrix(nodes), 2 * distances)
+    assert rebuilt.stations_distance_matrix(nodes).dtype == np.float32
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from src.Graph import Graph
+from src.SweepRunner import SweepRunner
+
+import city
+
+
+@pytest.fixture
+def runner(city_dir, monkeypatch):
+    # BikeGeneration places the bikes at random, the test city comes with its bikes placed
+    monkeypatch.setattr("src.SweepRunner.BikeGeneration", lambda num_bikes, mode, path: city.stations())
+    graph = Graph(city.NAME)
+    graph.set_path_cache(persist=True)
+    return SweepRunner(graph, until=20000, processes=2, stations_path=os.path.join("data", "stations.csv"))
+
+
+def grid():
+    configs = []
+    for radius in [300, 600, 900]:
+        config = city.config(1)
+        config["WALK_RADIUS"] = radius
+        configs.append(config)
+    return configs
+
+
+def test_worker_path_caches_are_merged_and_saved(runner, capsys):
+    assert len(runner.graph.path_cache.store) == 0
+    paths = runner.run(grid())
+
+    assert all(os.path.isdir(path) for path in paths)
+    assert len(runner.graph.path_cache.store) > 0
+    assert os.path.exists(runner.graph.path_cache.file)
+    assert capsys.readouterr().out.count("path cache hit rate:") == 3
+
+    # a new session starts from the lengths routed by the workers
+    graph = Graph.__new__(Graph)
+    graph.__dict__.update(runner.graph.__dict__)
+    graph.set_path_cache(persist=True)
+    assert len(graph.path_cache.store) == len(runner.graph.path_cache.store)
+
+
+def test_finished_runs_are_reused_from_the_manifest(runner, capsys):
+    configs = grid()
+    paths = runner.run(configs + configs[:1])
+    assert paths[0] == paths[-1]
+    assert "3 to run" in capsys.readouterr().out
+
+    # resumed: everything is found in the run manifest, the only run registry
+    assert runner.run(configs) == paths[:3]
+    assert "0 to run" in capsys.readouterr().out
+    assert sorted(os.listdir("results")) == sorted([os.path.basename(path) for path in paths[:3]] + ["runs.sqlite"])
+
+
+def test_rebuilt_graph_misses_the_cache(runner, capsys):
+    configs = grid()[:1]
+    path = runner.run(configs)[0]
+    traced = [dict(configs[0], PROFILE=True, TRACE={"ALL": "INFO"})]
+    assert runner.run(traced) == [path]  # reporting keys only
+    capsys.readouterr()
+
+    # same name, other streets
+    graph = Graph(city.NAME)
+    graph.lengths = graph.lengths * 1.5
+    assert graph.fingerprint() != runner.graph.fingerprint()
+    runner.graph = graph
+    assert runner.run(configs) != [path]
+    assert "1 to run" in capsys.readouterr().out
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from scipy.optimize import linprog
+
+from src.TransportationSolver import TransportationSolver
+
+
+def instance(n, seed):
+    # road-like costs between random cells [km], bikes and demand concentrated on a few cells
+    rng = np.random.RandomState(seed)
+    points = rng.uniform(0, 5, (n, 2))
+    cost = np.sqrt(((points[:, None] - points[None]) ** 2).sum(axis=2)) * rng.uniform(1.1, 1.4, (n, n))
+    np.fill_diagonal(cost, 0)
+    supply = rng.poisson(rng.choice([0.2, 3], n))
+    demand = rng.poisson(rng.choice([0.2, 3], n))
+    return cost, supply, demand
+
+
+def lp(cost, supply, demand, arcs=None):
+    # the rebalancing LP: served demand first (unserved demand is a slack at 1e6 per bike), then the distance
+    n = len(cost)
+    arcs = np.ones((n, n), dtype=bool) if arcs is None else arcs
+    i, j = np.nonzero(arcs)
+    m = len(i)
+    rows = np.concatenate([i, n + j, 2 * n + j, 2 * n + np.arange(n)])
+    cols = np.concatenate([np.arange(m), np.arange(m), np.arange(m), m + np.arange(n)])
+    values = np.concatenate([np.ones(2 * m), -np.ones(m + n)])
+    A = sparse.csr_matrix((values, (rows, cols)), shape=(3 * n, m + n))
+    b = np.concatenate([supply, demand, -demand])
+    res = linprog(np.concatenate([cost[i, j], np.full(n, 1e6)]), A_ub=A, b_ub=b, bounds=(0, None), method="highs")
+    assert res.status == 0
+    flow = np.zeros((n, n))
+    flow[i, j] = res.x[:m]
+    return flow
+
+
+def check(flow, cost, supply, demand, arcs=None):
+    expected = lp(cost, supply, demand, arcs)
+    assert np.issubdtype(flow.dtype, np.integer) and (flow >= 0).all()
+    assert (flow.sum(axis=1) <= supply).all() and (flow.sum(axis=0) <= demand).all()
+    assert flow.sum() == round(expected.sum())
+    assert (flow * cost).sum() == pytest.approx((expected * cost).sum(), rel=1e-9, abs=1e-9)
+    if arcs is not None:
+        assert not flow[~arcs].any()
+
+
+@pytest.mark.parametrize("n, seed", [(1, 0), (5, 1), (30, 2), (80, 3)])
+def test_matches_the_lp(n, seed):
+    cost, supply, demand = instance(n, seed)
+    flow = TransportationSolver(cost).solve(supply, demand)
+    check(flow, cost, supply, demand)
+    assert flow.sum() == min(supply.sum(), demand.sum())  # every cell is reachable
+
+
+def test_no_bikes_or_no_demand():
+    cost, supply, demand = instance(20, 4)
+    solver = TransportationSolver(cost)
+    assert solver.solve(np.zeros(20, dtype=int), demand).sum() == 0
+    assert solver.solve(supply, np.zeros(20, dtype=int)).sum() == 0
+
+
+def test_warm_start_keeps_the_optimum():
+    # consecutive rebalancing periods: the bikes move a little, the demand changes
+    cost, supply, demand = instance(40, 5)
+    rng = np.random.RandomState(6)
+    warm = TransportationSolver(cost)
+    for _ in range(12):
+        flow = warm.solve(supply, demand)
+        check(flow, cost, supply, demand)
+        np.testing.assert_allclose((flow * cost).sum(), (TransportationSolver(cost).solve(supply, demand) * cost).sum(), rtol=1e-9, atol=1e-9)
+        supply = np.maximum(supply + rng.randint(-1, 2, 40), 0)
+        demand = rng.poisson(rng.choice([0.2, 3], 40))
+
+
+@pytest.mark.parametrize("k", [1, 3, 8])
+def test_nearest_cells_restrict_the_arcs(k):
+    cost, supply, demand = instance(30, 7)
+    arcs = np.zeros_like(cost, dtype=bool)
+    arcs[np.arange(30)[:, None], np.argsort(cost, axis=1)[:, :k]] = True
+    np.fill_diagonal(arcs, True)
+
+    warm = TransportationSolver(cost, k)
+    for seed in range(3):
+        flow = warm.solve(supply, demand)
+        check(flow, cost, supply, demand, arcs)
+        supply, demand = instance(30, 10 + seed)[1:]
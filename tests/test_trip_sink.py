@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.TripSink import TripSink
+from src.UserTrip import UserTrip
+from src.BikeTrip import BikeTrip
+from src.Results import Results
+
+import city
+
+
+def trip(user_id):
+    user_trip = UserTrip()
+    user_trip.set("user_id", user_id)
+    user_trip.set("bike_id", user_id % 3)
+    user_trip.set("time_ride", user_id + 0.125, 1)
+    user_trip.set("instant_bike", user_id % 2 == 0)
+    user_trip.set("origin_lon", -71.1 + user_id * 1e-4, 5)
+    return user_trip
+
+
+def test_set_normalizes_numpy_scalars():
+    user_trip = UserTrip()
+    user_trip.set("user_id", np.int64(7))
+    user_trip.set("time_ride", np.float64(12.345678))
+    user_trip.set("time_wait", np.float32(3.7), 0)
+    user_trip.set("instant_bike", np.bool_(True))
+    assert [type(user_trip.store[key]) for key in ["user_id", "time_ride", "time_wait", "instant_bike"]] == [int, float, int, int]
+    assert user_trip.get_data().split(",")[:10] == ["7", "", "", "", "", "", "", "12.35", "3", ""]
+
+    bike_trip = BikeTrip()
+    bike_trip.set("battery_out", np.float64(61.234), 1)
+    bike_trip.set("instant_dock", np.bool_(False))
+    assert bike_trip.store["battery_out"] == 61.2 and type(bike_trip.store["battery_out"]) is float
+    assert bike_trip.store["instant_dock"] == 0 and type(bike_trip.store["instant_dock"]) is int
+
+
+@pytest.mark.parametrize("batch_size", [1, 4, 100])
+def test_csv_batches(tmp_path, batch_size):
+    sink = TripSink(str(tmp_path), "user_trips", UserTrip.header, UserTrip.dtypes, "csv", batch_size)
+    expected = UserTrip.get_header()
+    for user_id in range(10):
+        user_trip = trip(user_id)
+        sink.add(user_trip.store)
+        expected += user_trip.get_data()
+    sink.close()
+
+    assert sink.rows == 10
+    with open(os.path.join(str(tmp_path), "user_trips.csv")) as f:
+        assert f.read() == expected
+
+
+def test_values_of_other_types_keep_their_text(tmp_path):
+    # the columns are typed, but a record is written as it was set
+    sink = TripSink(str(tmp_path), "user_trips", UserTrip.header, UserTrip.dtypes, "csv", 2)
+    expected = UserTrip.get_header()
+    for values in [{"user_id": 3.5, "origin_lon": -71, "bike_id": "b1", "time_ride": float("nan")}, {"user_id": None, "status": 7}, {}]:
+        user_trip = UserTrip()
+        user_trip.store.update(values)
+        sink.add(user_trip.store)
+        expected += user_trip.get_data()
+    sink.close()
+    with open(os.path.join(str(tmp_path), "user_trips.csv")) as f:
+        assert f.read() == expected
+
+
+def test_buffers_are_typed(tmp_path):
+    sink = TripSink(str(tmp_path), "user_trips", UserTrip.header, UserTrip.dtypes, "csv", 8)
+    dtypes = dict(zip(UserTrip.header, [values.dtype for values in sink.values]))
+    assert dtypes["user_id"] == np.int64 and dtypes["origin_lon"] == np.float64 and dtypes["status"] == object
+    assert all(len(values) == 8 for values in sink.values)
+    sink.close()
+
+
+def test_gzip_holds_the_csv_rows(tmp_path):
+    for format in ["csv", "csv.gz"]:
+        sink = TripSink(str(tmp_path), "user_trips", UserTrip.header, UserTrip.dtypes, format, 4)
+        for user_id in range(10):
+            sink.add(trip(user_id).store)
+        sink.close()
+    pd.testing.assert_frame_equal(pd.read_csv(os.path.join(str(tmp_path), "user_trips.csv.gz")), pd.read_csv(os.path.join(str(tmp_path), "user_trips.csv")))
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        TripSink(str(tmp_path), "user_trips", UserTrip.header, UserTrip.dtypes, "xlsx")
+
+
+def test_parquet_types(tmp_path):
+    pytest.importorskip("pyarrow")
+    sink = TripSink(str(tmp_path), "user_trips", UserTrip.header, UserTrip.dtypes, "parquet", 4)
+    for user_id in range(10):
+        sink.add(trip(user_id).store)
+    sink.close()
+
+    trips = pd.read_parquet(os.path.join(str(tmp_path), "user_trips.parquet"))
+    assert list(trips.user_id) == list(range(10))
+    assert trips.time_wait.isna().all()  # never set
+    assert trips.origin_lon.dtype == np.float64
+
+
+def test_kpis_skip_unset_and_nan_times(city_dir):
+    results = Results(city.config(0))
+    served = trip(0)
+    served.set("time_wait", 10.0)
+    unserved = UserTrip()
+    unserved.set("bike_id", float("nan"))
+    unserved.set("time_ride", np.float64("nan"))
+    unserved.set("time_wait", 30.0)
+    results.add_user_trip(served)
+    results.add_user_trip(unserved)
+    results.close()
+
+    kpis = results.kpis()
+    assert kpis["users"] == 2 and kpis["users_served"] == 1
+    assert kpis["mean_time_ride"] == 0.1
+    assert kpis["mean_time_wait"] == 20.0
+    assert kpis["mean_time_walk_origin"] is None